@@ -0,0 +1,278 @@
+"""Local stand-in for the semantha® REST endpoints used by the playground.
+
+Serves ``info``, ``domains/<domain>/references``, ``referencedocuments`` (list
+and single document) and ``settings`` with a synthetic library of
+``library_size`` documents, and sleeps ``latency`` seconds per request to
+emulate the network and server time. Similarities are word overlaps, so search
+results are deterministic and ranked. Every request is counted per endpoint;
+the counters are served (and reset) under ``/_mock/calls``.
+
+Faults can be injected with a JSON ``PUT /_mock/faults`` of ``{"status": 503,
+"rate": 0.5, "delay": 2.0}``: that share of the requests is answered with the
+status (if given) after the extra delay. ``DELETE /_mock/faults`` removes them.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence
+from urllib.parse import parse_qs, urlparse
+
+_PREFIX = "/tt-platform-server/api"
+_DOMAIN_PATH = re.compile(
+    rf"^{_PREFIX}/v3/domains/(?P<domain>[^/]+)/(?P<endpoint>references|referencedocuments|settings)(?:/(?P<doc_id>[^/]+))?$"
+)
+_WORDS = re.compile(r"\w+")
+_OPPOSITES = {"not", "never", "hate", "no"}
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORDS.findall(text.lower()))
+
+
+class MockLibrary:
+    """Synthetic documents drawn from a small vocabulary with a fixed seed."""
+
+    def __init__(self, size: int, seed=0, vocabulary_size=2000, words=(20, 200)):
+        rng = random.Random(seed)
+        vocabulary = [f"w{i}" for i in range(vocabulary_size)]
+        self.ids = [f"doc-{i:06d}" for i in range(size)]
+        self.names = [f"Document {i}" for i in range(size)]
+        self.paragraphs = [
+            [
+                " ".join(rng.choices(vocabulary, k=rng.randint(*words) // 4))
+                for _ in range(4)
+            ]
+            for _ in range(size)
+        ]
+        self.word_sets = [_words(" ".join(p)) for p in self.paragraphs]
+        self.positions = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def order(self, sort: str = None) -> Sequence[int]:
+        """Document positions sorted by ``name`` or ``-name`` (or as stored)."""
+        if sort is None:
+            return range(len(self.ids))
+        field = sort.lstrip("-")
+        if field != "name":
+            raise ValueError(f"Unsupported sort field {field}")
+        return sorted(
+            range(len(self.ids)),
+            key=lambda i: self.names[i],
+            reverse=sort.startswith("-"),
+        )
+
+    def search(self, text: str, threshold: float, max_references: int):
+        query = _words(text)
+        if not query:
+            return []
+        scores = (
+            (len(query & words) / len(query), i)
+            for i, words in enumerate(self.word_sets)
+        )
+        hits = sorted((s for s in scores if s[0] >= threshold), reverse=True)
+        return hits[:max_references]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; with Nagle's algorithm the body
+    # waits for the client's delayed ACK of the headers (~40 ms per request)
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.__dispatch("GET")
+
+    def do_POST(self):
+        self.__dispatch("POST")
+
+    def do_PATCH(self):
+        self.__dispatch("PATCH")
+
+    def do_PUT(self):
+        self.__dispatch("PUT")
+
+    def do_DELETE(self):
+        self.__dispatch("DELETE")
+
+    def __dispatch(self, method):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path == "/_mock/calls":
+            with self.server.lock:
+                calls = dict(self.server.calls)
+                if method == "DELETE":
+                    self.server.calls.clear()
+            return self.__reply(calls)
+        if url.path == "/_mock/faults":
+            with self.server.lock:
+                self.server.faults = json.loads(body) if method == "PUT" else {}
+            return self.__reply(self.server.faults)
+        match = _DOMAIN_PATH.match(url.path)
+        if url.path == f"{_PREFIX}/info":
+            endpoint = "info"
+        elif match is not None:
+            endpoint = match["endpoint"] + ("/{id}" if match["doc_id"] else "")
+        else:
+            return self.__reply({"error": f"unknown path {url.path}"}, status=404)
+        with self.server.lock:
+            self.server.calls[f"{method} {endpoint}"] += 1
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            faults = dict(self.server.faults)
+        if faults and self.server.random.random() < faults.get("rate", 1.0):
+            time.sleep(faults.get("delay", 0))
+            if "status" in faults:
+                return self.__reply({"error": "injected"}, status=faults["status"])
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if endpoint == "info":
+            return self.__reply({"title": "semantha mock", "version": "mock"})
+        handler = getattr(self, f"_{method}_{endpoint.replace('/{id}', '_id')}", None)
+        if handler is None:
+            return self.__reply({"error": f"{method} {endpoint}"}, status=405)
+        return self.__reply(handler(match["domain"], match["doc_id"], query, body))
+
+    def _GET_referencedocuments(self, domain, doc_id, query, body):
+        library = self.server.library
+        offset = int(query.get("offset", 0))
+        end = min(len(library.ids), offset + int(query.get("limit", len(library.ids))))
+        order = library.order(query.get("sort"))
+        return {
+            "meta": {"page": {"from": offset, "to": end, "total": len(library.ids)}},
+            "data": [
+                {"id": library.ids[i], "name": library.names[i]}
+                for i in order[offset:end]
+            ],
+        }
+
+    def _GET_referencedocuments_id(self, domain, doc_id, query, body):
+        library = self.server.library
+        i = library.positions[doc_id]
+        return {
+            "id": doc_id,
+            "name": library.names[i],
+            "pages": [
+                {
+                    "contents": [
+                        {"paragraphs": [{"text": p} for p in library.paragraphs[i]]}
+                    ]
+                }
+            ],
+        }
+
+    def _POST_references(self, domain, doc_id, query, body):
+        form = self.__form(body)
+        threshold = float(form.get("similaritythreshold", 0))
+        max_references = int(query.get("maxreferences", 10))
+        if "referencedocument" in form:
+            left, right = _words(form["file"]), _words(form["referencedocument"])
+            similarity = len(left & right) / max(len(left | right), 1)
+            if similarity < threshold:
+                return {"references": []}
+            reference = {
+                "documentId": "referencedocument",
+                "similarity": similarity,
+                "hasOppositeMeaning": bool((left ^ right) & _OPPOSITES),
+            }
+            return {
+                "references": [reference],
+                "pages": [
+                    {"contents": [{"paragraphs": [{"references": [reference]}]}]}
+                ],
+            }
+        hits = self.server.library.search(form["file"], threshold, max_references)
+        return {
+            "references": [
+                {"documentId": self.server.library.ids[i], "similarity": s}
+                for s, i in hits
+            ]
+        }
+
+    def _GET_settings(self, domain, doc_id, query, body):
+        with self.server.lock:
+            return {"similarityModelId": self.server.models.get(domain)}
+
+    def _PATCH_settings(self, domain, doc_id, query, body):
+        model_id = json.loads(body)["similarityModelId"]
+        with self.server.lock:
+            self.server.models[domain] = model_id
+        return {"similarityModelId": model_id}
+
+    def __form(self, body: bytes) -> dict[str, str]:
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        return {
+            part.get_param("name", header="content-disposition"): part.get_payload(
+                decode=True
+            ).decode("utf-8")
+            for part in message.iter_parts()
+        }
+
+    def __reply(self, payload, status=200):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, library: MockLibrary, latency: float):
+        super().__init__(address, _Handler)
+        self.library = library
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.models = {}
+        self.faults = {}
+        self.random = random.Random(0)
+
+
+class MockSemanthaServer:
+    """Runs the mock server on a background thread of the current process."""
+
+    def __init__(self, library_size=1000, latency=0.02, seed=0, host="127.0.0.1"):
+        self.__server = _Server((host, 0), MockLibrary(library_size, seed), latency)
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, name="semantha-mock", daemon=True
+        )
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve(library_size: int, latency: float, seed: int, ready):
+    """Process entry point; sends the server URL through the ``ready`` pipe."""
+    server = MockSemanthaServer(library_size, latency, seed)
+    ready.send(server.url)
+    server.start()
+    threading.Event().wait()
@@ -0,0 +1,95 @@
+"""Render the playground's pages headless, for the page flows of the benchmarks.
+
+The pages run in Streamlit's ``LocalScriptRunner`` inside the benchmark
+process and talk to the mock server through the shared connector, like a
+browser session would: ``PageSession.run`` is one script run with the widget
+values that were set on the elements of the previous run.
+"""
+import os
+import time
+from unittest.mock import MagicMock
+
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import (
+    MemoryCacheStorageManager,
+)
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.element_tree import ElementTree, parse_tree_from_messages
+from streamlit.testing.local_script_runner import LocalScriptRunner
+
+from semantha_lit import PAGES
+
+_SCRIPT = """from semantha_lit import PAGES, load_page
+
+load_page(*PAGES[{name!r}]).build()
+"""
+
+
+def install(url: str, api_key: str, directory: str):
+    """Point the pages at ``url`` and stand in for the Streamlit server."""
+    secrets = os.path.join(directory, "secrets.toml")
+    with open(secrets, "w") as f:
+        f.write(f'[semantha]\nserver_url = "{url}"\napi_key = "{api_key}"\n')
+    st.secrets = Secrets([secrets])
+    # the same stand-in as Streamlit's own script tests use
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    config.set_option("runner.postScriptGC", False)
+
+
+def page_script(module: str, directory: str) -> str:
+    """A script that builds the page of ``module``, like the app does."""
+    (name,) = [name for name, (module_, _) in PAGES.items() if module_ == module]
+    path = os.path.join(directory, f"{module}.py")
+    with open(path, "w") as f:
+        f.write(_SCRIPT.format(name=name))
+    return path
+
+
+def widget(tree: ElementTree, element_type: str, label: str):
+    (found,) = [e for e in tree.get(element_type) if e.label == label]
+    return found
+
+
+class PageSession:
+    """One browser session on a page script."""
+
+    def __init__(self, script_path: str, timeout: float = 60):
+        self.__script_path = script_path
+        self.__timeout = timeout
+        self.tree = None
+
+    def run(self) -> ElementTree:
+        if self.tree is None:
+            runner = LocalScriptRunner(self.__script_path)
+            widget_states = None
+        else:
+            runner = LocalScriptRunner(self.__script_path, self.tree.session_state)
+            widget_states = self.tree.get_widget_states()
+        runner.request_rerun(RerunData(widget_states=widget_states))
+        runner.start()
+        deadline = time.monotonic() + self.__timeout
+        # polled much more often than by the runner's own run(), which would
+        # round every run up to 100 ms
+        while not runner.script_stopped():
+            if time.monotonic() > deadline:
+                runner.request_stop()
+                runner.join()
+                raise TimeoutError(f"{self.__script_path} took too long")
+            time.sleep(0.002)
+        runner.join()
+        tree = parse_tree_from_messages(runner.forward_msgs())
+        tree.script_path = self.__script_path
+        tree._session_state = runner.session_state
+        exceptions = tree.get("exception")
+        if exceptions:
+            raise RuntimeError(f"{self.__script_path}: {exceptions[0].message}")
+        self.tree = tree
+        return tree
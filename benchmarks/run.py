@@ -0,0 +1,405 @@
+"""Benchmark the playground's flows against a local mock semantha® server.
+
+Run from the repository root::
+
+    PYTHONPATH=src python -m benchmarks.run [--flow search ...] [--latency 0.02] [--update-baseline]
+
+Starts ``benchmarks.mock_server`` in a separate process and drives the search,
+library, compare, batch compare and cluster flows through ``SemanthaConnector``
+with the settings of the pages' config files, from ``--sessions`` concurrent
+sessions. The ``*_page`` flows render the Semantic Search, Semantic Compare and
+Smart Cluster pages headless (``benchmarks.pages``) and click through them like
+a visitor, so they cover the page code on top of the connector. Reports the
+latency percentiles per operation, the backend calls per endpoint and the peak
+memory (RSS) of every flow, and exits with status 1 when a flow is slower,
+makes more calls or uses more memory than ``baseline.json`` allows
+(``--tolerance``). Each flow runs in a fresh process with a fresh connector and
+an empty workbook cache directory, so the numbers include the cold caches and
+do not depend on earlier runs. Latencies still vary by up to about 20% between
+runs on one machine; the default tolerance leaves room for that, and baselines
+only compare well with runs on the machine they were recorded on.
+"""
+import argparse
+import ast
+import configparser
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import requests
+from tabulate import tabulate
+
+from benchmarks.mock_server import MockLibrary, serve
+from cluster.engine import ClusteringEngine, cluster_library
+from cluster.figures import document_map, topic_map
+from semantha.SemanthaConnector import get_connector
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data")
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+# absolute slack on top of the relative tolerance, for flows that are near zero
+_SLACK = {"p95_ms": 5.0, "calls": 2, "peak_mib": 1.0}
+
+
+def read_config(name):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(DATA_PATH, name, "config.toml"))
+    return config
+
+
+def _queries(library: MockLibrary, count: int, rng: random.Random) -> list[str]:
+    """Queries made of words of random library documents, plus some noise."""
+    queries = []
+    for _ in range(count):
+        words = " ".join(rng.choice(library.paragraphs)).split()
+        queries.append(" ".join(rng.sample(words, 4) + [f"noise{rng.randint(0, 99)}"]))
+    return queries
+
+
+def search_flow(connector, args, rng, texts):
+    config = read_config("semantic_search")
+    prefix = config["search_domains"]["domain_prefix"]
+    use_cases = ast.literal_eval(config["search_domains"]["use_cases"])
+    # a few distinct queries are repeated, like the default queries of the page
+    queries = rng.choices(texts, k=args.sessions * args.iterations)
+    use_case = list(use_cases.items())
+    for i, query in enumerate(queries):
+        name, settings = use_case[i % len(use_case)]
+        yield lambda query=query, name=name, settings=settings: connector.query_library(
+            query,
+            prefix + name,
+            threshold=settings["threshold"],
+            tags=settings["search_tags"],
+        )
+
+
+def library_flow(connector, args, rng, texts):
+    config = read_config("semantic_search")
+    prefix = config["search_domains"]["domain_prefix"]
+    use_cases = ast.literal_eval(config["search_domains"]["use_cases"])
+    page_size = int(config["library"]["page_size"])
+    for i in range(args.sessions * args.iterations):
+        name, settings = list(use_cases.items())[i % len(use_cases)]
+        # sessions open random pages of the library table, sorted or not
+        offset = page_size * rng.randrange(max(args.library_size // page_size, 1))
+        sort = rng.choice([None, "name", "-name"])
+
+        def open_page(name=name, settings=settings, offset=offset, sort=sort):
+            connector.library_size(prefix + name, settings["library_tags"])
+            return list(
+                connector.iter_library(
+                    prefix + name,
+                    tags=settings["library_tags"],
+                    offset=offset,
+                    limit=page_size,
+                    page_size=page_size,
+                    sort=sort,
+                )
+            )
+
+        yield open_page
+
+
+def compare_flow(connector, args, rng, texts):
+    config = read_config("semantic_compare")
+    models = list(ast.literal_eval(config["models"]["ids"]).values())
+    model_domains = ast.literal_eval(config["models"]["domains"])
+    for i in range(args.sessions * args.iterations):
+        model_id = models[i % len(models)]
+        domain = model_domains.get(model_id, config["domain"]["name"])
+        input_0, input_1 = rng.sample(texts, 2)
+        omd = rng.random() < 0.5
+        yield lambda a=input_0, b=input_1, m=model_id, d=domain, o=omd: (
+            connector.do_semantic_string_compare(a, b, d, m, with_opposite_meaning=o)
+        )
+
+
+def batch_compare_flow(connector, args, rng, texts):
+    config = read_config("semantic_compare")
+    model_id = list(ast.literal_eval(config["models"]["ids"]).values())[0]
+    domain = ast.literal_eval(config["models"]["domains"]).get(
+        model_id, config["domain"]["name"]
+    )
+    max_concurrency = int(config["batch"]["max_concurrency"])
+    for _ in range(args.sessions):
+        pairs = [tuple(rng.sample(texts, 2)) for _ in range(args.batch_size)]
+        yield lambda pairs=pairs: connector.compare_batch(
+            pairs, domain, model_id, max_concurrency=max_concurrency
+        )
+
+
+def cluster_flow(connector, args, rng, texts):
+    config = read_config("smartcluster")
+    engine = ClusteringEngine(
+        broad_topics=int(config["engine"]["broad_topics"]),
+        fine_topics=int(config["engine"]["fine_topics"]),
+        outlier_threshold=float(config["engine"]["outlier_threshold"]),
+    )
+
+    def cluster():
+        result = cluster_library(connector, "PG_Cluster", engine)
+        return document_map(result, "fine"), topic_map(result, "broad")
+
+    yield cluster
+
+
+def search_page_flow(connector, args, rng, texts, directory):
+    from benchmarks.pages import PageSession, page_script, widget
+
+    script = page_script("subpage.semantic_search", directory)
+    for query in rng.choices(texts, k=args.sessions * args.iterations):
+
+        def search(query=query):
+            session = PageSession(script)
+            widget(session.run(), "text_input", "Query").set_value(query)
+            widget(session.tree, "button", "🔍 Search").click()
+            session.run()
+
+        yield search
+
+
+def compare_page_flow(connector, args, rng, texts, directory):
+    from benchmarks.pages import PageSession, page_script, widget
+
+    script = page_script("subpage.semantic_compare", directory)
+    models = list(ast.literal_eval(read_config("semantic_compare")["models"]["ids"]))
+    for i in range(args.sessions * args.iterations):
+        input_0, input_1 = rng.sample(texts, 2)
+
+        def compare(model=models[i % len(models)], input_0=input_0, input_1=input_1):
+            session = PageSession(script)
+            tree = session.run()
+            widget(tree, "selectbox", "Which model would you like to use?").select(
+                model
+            )
+            widget(tree, "text_input", "Input I").set_value(input_0)
+            widget(tree, "text_input", "Input II").set_value(input_1)
+            widget(tree, "button", "⇆ Semantic Compare").click()
+            session.run()
+
+        yield compare
+
+
+def cluster_page_flow(connector, args, rng, texts, directory):
+    from benchmarks.pages import PageSession, page_script, widget
+
+    script = page_script("subpage.smart_cluster", directory)
+    use_cases = [
+        name
+        for name, use_case in ast.literal_eval(
+            read_config("smartcluster")["use_cases"]["names"]
+        ).items()
+        if os.path.exists(
+            os.path.join(DATA_PATH, "smartcluster", use_case, "data.xlsx")
+        )
+    ]
+    for i in range(args.sessions * args.iterations):
+
+        def cluster(use_case=use_cases[i % len(use_cases)]):
+            session = PageSession(script)
+            widget(session.run(), "selectbox", "📚 Use-Case").select(use_case)
+            session.run()
+            widget(session.tree, "button", "✨ Cluster documents").click()
+            session.run()
+
+        yield cluster
+
+
+FLOWS = {
+    "search": search_flow,
+    "library": library_flow,
+    "compare": compare_flow,
+    "batch_compare": batch_compare_flow,
+    "cluster": cluster_flow,
+}
+# flows through the rendered pages, they get a directory for their scripts
+PAGE_FLOWS = {
+    "search_page": search_page_flow,
+    "compare_page": compare_page_flow,
+    "cluster_page": cluster_page_flow,
+}
+
+
+def _max_rss_mib() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+
+def _timed(operation):
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def _clear_caches(directory: str):
+    """Start from the cold caches of a fresh checkout.
+
+    The workbooks are converted again into an empty cache directory instead of
+    the one left behind by the app or earlier runs, and no figure is decoded.
+    """
+    from cluster import data_store, figure_store
+
+    data_store._STORE = data_store.FrameStore(os.path.join(directory, "frames"))
+    figure_store._STORES.clear()
+
+
+def run_flow(name, url, args, texts) -> dict:
+    requests.delete(f"{url}/_mock/calls")
+    # the shared connector, which the pages of the page flows use as well
+    connector = get_connector(url, "benchmark")
+    requests.delete(f"{url}/_mock/calls")  # the login is not part of the flow
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        _clear_caches(directory)
+        if name in PAGE_FLOWS:
+            from benchmarks.pages import install
+
+            install(url, "benchmark", directory)
+            operations = list(PAGE_FLOWS[name](connector, args, rng, texts, directory))
+        else:
+            operations = list(FLOWS[name](connector, args, rng, texts))
+        rss_before = _max_rss_mib()
+        with ThreadPoolExecutor(max_workers=args.sessions) as sessions:
+            latencies = np.array(list(sessions.map(_timed, operations))) * 1000
+    calls = requests.get(f"{url}/_mock/calls").json()
+    return {
+        "operations": len(operations),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "calls": sum(calls.values()),
+        "calls_by_endpoint": calls,
+        # growth of the peak RSS of the (fresh) process while the flow ran
+        "peak_mib": _max_rss_mib() - rss_before,
+    }
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    for flow, result in results.items():
+        if flow not in baseline:
+            continue
+        for metric, slack in _SLACK.items():
+            allowed = baseline[flow][metric] * (1 + tolerance) + slack
+            if result[metric] > allowed:
+                found.append(
+                    f"{flow}: {metric} {result[metric]:.1f} > {allowed:.1f} "
+                    f"(baseline {baseline[flow][metric]:.1f})"
+                )
+    return found
+
+
+def _settings(args) -> dict:
+    return {
+        key: getattr(args, key)
+        for key in (
+            "latency",
+            "library_size",
+            "sessions",
+            "iterations",
+            "batch_size",
+            "seed",
+        )
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--flow",
+        action="append",
+        choices=list(FLOWS) + list(PAGE_FLOWS),
+        help="flow to run (repeatable, default: all)",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="mock server latency in seconds"
+    )
+    parser.add_argument("--library-size", type=int, default=1000)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument(
+        "--iterations", type=int, default=10, help="operations per session"
+    )
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    texts = _queries(MockLibrary(args.library_size, args.seed), 200, rng)
+    receive, send = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=serve,
+        args=(args.library_size, args.latency, args.seed, send),
+        daemon=True,
+    )
+    server.start()
+    try:
+        url = receive.recv()
+        results = {}
+        for flow in args.flow or list(FLOWS) + list(PAGE_FLOWS):
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as process:
+                results[flow] = process.submit(
+                    run_flow, flow, url, args, texts
+                ).result()
+    finally:
+        server.terminate()
+
+    print(
+        tabulate(
+            [
+                [flow, r["operations"], r["p50_ms"], r["p95_ms"], r["p99_ms"]]
+                + [r["max_ms"], r["calls"], r["peak_mib"]]
+                for flow, r in results.items()
+            ],
+            headers=["flow", "ops", "p50 ms", "p95 ms", "p99 ms", "max ms"]
+            + ["calls", "peak MiB"],
+            floatfmt=".1f",
+        )
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": _settings(args), "flows": results}, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {"settings": _settings(args), "flows": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)
+        baseline["settings"] = _settings(args)
+        baseline["flows"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with, run with --update-baseline first")
+        return 0
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    if baseline["settings"] != _settings(args):
+        print("Baseline was recorded with other settings, skipping the comparison")
+        return 0
+    found = regressions(results, baseline["flows"], args.tolerance)
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
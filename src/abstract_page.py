@@ -1,8 +1,6 @@
 from abc import ABC, abstractmethod
 import streamlit as st
 
-from semantha.SemanthaConnector import SemanthaConnector
-
 
 class AbstractPage(ABC):
     def __init__(self, name):
@@ -21,9 +19,13 @@ class AbstractPage(ABC):
 
 
 class SemanthaBasePage(AbstractPage, ABC):
-    def __init__(self, name):
-        super().__init__(name)
-        self._semantha_connector = SemanthaConnector(
+    @property
+    def _semantha_connector(self):
+        # the SDK is slow to import, so it is only loaded (and the shared
+        # connector logged in) once a page actually talks to semantha®
+        from semantha.SemanthaConnector import get_connector
+
+        return get_connector(
             server_base_url=st.secrets["semantha"]["server_url"],
             api_key=st.secrets["semantha"]["api_key"],
         )
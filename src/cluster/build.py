@@ -0,0 +1,202 @@
+"""Build the Smart Cluster artifacts of every use case from its data.xlsx.
+
+Run from the repository root::
+
+    PYTHONPATH=src python -m cluster.build [--use-case startups ...] [--jobs 4] [--force]
+
+For each use case the topic columns of its documents (``document_topics.xlsx``,
+data.xlsx itself is not changed) and, per granularity, the ``*_excel.xlsx``
+topic table and the ``*_map.json``, ``*_doc_map.json`` and
+(for topics-over-time use cases) ``*_tot.json`` figures are written, together
+with the ``topic_model.npz`` that ``cluster.incremental`` assigns new documents
+with. A use case is only rebuilt when the hash of its inputs (documents, time
+column and engine settings) differs from the one recorded in its
+``build.json``, or when one of its artifacts is missing. Use cases without a
+data.xlsx keep their artifacts as they are.
+
+The build clusters with the lexical ``HashingEmbedder``. The artifacts that
+ship with the repository come from semantha® embeddings and have no
+``build.json``; they are only replaced with ``--force``.
+"""
+import argparse
+import ast
+import configparser
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import plotly.io as pio
+
+from cluster.data_store import DOCUMENT_TOPICS, as_text, get_frame
+from cluster.engine import ClusteringEngine
+from cluster.figures import document_map, topic_map, topics_over_time
+from cluster.incremental import MODEL, TopicModel
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "smartcluster")
+GRANULARITIES = ("broad", "fine")
+_MANIFEST = "build.json"
+
+
+def read_config():
+    config = configparser.ConfigParser()
+    config.read(os.path.join(DATA_PATH, "config.toml"))
+    return config
+
+
+def _engine_settings(config) -> dict:
+    return dict(
+        broad_topics=int(config["engine"]["broad_topics"]),
+        fine_topics=int(config["engine"]["fine_topics"]),
+        outlier_threshold=float(config["engine"]["outlier_threshold"]),
+    )
+
+
+def _artifacts(use_case: str, with_tot: bool) -> list[str]:
+    types = ["excel.xlsx", "map.json", "doc_map.json"]
+    if with_tot:
+        types.append("tot.json")
+    return [DOCUMENT_TOPICS] + [
+        os.path.join(granularity, f"{granularity}_{t}")
+        for granularity in GRANULARITIES
+        for t in types
+    ]
+
+
+def input_hash(data: pd.DataFrame, time_column: str, settings: dict) -> str:
+    columns = ["Name", "Content"] + ([time_column] if time_column else [])
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update(
+        pd.util.hash_pandas_object(
+            pd.DataFrame({column: as_text(data[column]) for column in columns}),
+            index=False,
+        ).values.tobytes()
+    )
+    return digest.hexdigest()
+
+
+def is_up_to_date(use_case_path: str, digest: str, artifacts: list[str]) -> bool:
+    manifest = os.path.join(use_case_path, _MANIFEST)
+    if not os.path.exists(manifest):
+        return False
+    with open(manifest, "r") as f:
+        if json.load(f).get("inputs") != digest:
+            return False
+    return all(
+        os.path.exists(os.path.join(use_case_path, artifact)) for artifact in artifacts
+    )
+
+
+def is_curated(use_case_path: str, artifacts: list[str]) -> bool:
+    """Whether the use case has artifacts that were not made by this build."""
+    return not os.path.exists(os.path.join(use_case_path, _MANIFEST)) and any(
+        os.path.exists(os.path.join(use_case_path, artifact)) for artifact in artifacts
+    )
+
+
+def build_use_case(
+    use_case: str, settings: dict, time_column: str = None, force=False
+) -> str:
+    """Build one use case; returns what happened for the build report."""
+    use_case_path = os.path.join(DATA_PATH, use_case)
+    source = os.path.join(use_case_path, "data.xlsx")
+    if not os.path.exists(source):
+        return "skipped, there is no data.xlsx to build from"
+    data = get_frame(source)
+    if time_column is not None and time_column not in data.columns:
+        time_column = None
+    digest = input_hash(data, time_column, settings)
+    artifacts = _artifacts(use_case, time_column is not None)
+    if not force and is_curated(use_case_path, artifacts):
+        return "skipped, keeping the curated artifacts (--force replaces them)"
+    if not force and is_up_to_date(use_case_path, digest, artifacts):
+        return "up to date"
+
+    logging.info(f"Clustering {use_case} ({data.shape[0]} documents)")
+    result = ClusteringEngine(n_jobs=1, **settings).cluster(
+        as_text(data["Name"]).tolist(), as_text(data["Content"]).tolist()
+    )
+    for granularity in GRANULARITIES:
+        os.makedirs(os.path.join(use_case_path, granularity), exist_ok=True)
+        prefix = os.path.join(use_case_path, granularity, granularity)
+        result.topics[granularity].to_excel(f"{prefix}_excel.xlsx")
+        figures = {
+            "map": topic_map(result, granularity),
+            "doc_map": document_map(result, granularity),
+        }
+        if time_column is not None:
+            figures["tot"] = topics_over_time(
+                result, granularity, data[time_column].tolist()
+            )
+        for type_, figure in figures.items():
+            with open(f"{prefix}_{type_}.json", "w") as f:
+                f.write(pio.to_json(figure))
+
+    TopicModel.from_result(result).save(os.path.join(use_case_path, MODEL))
+    # row by row next to data.xlsx, which stays as it was checked in
+    pd.DataFrame(
+        {
+            f"{granularity}_topics": result.documents[f"{granularity}_topics"].values
+            for granularity in GRANULARITIES
+        }
+    ).to_excel(os.path.join(use_case_path, DOCUMENT_TOPICS), index=False)
+    with open(os.path.join(use_case_path, _MANIFEST), "w") as f:
+        json.dump({"inputs": digest, "artifacts": artifacts}, f, indent=2)
+    return "built"
+
+
+def main(argv=None):
+    config = read_config()
+    use_cases = list(ast.literal_eval(config["use_cases"]["names"]).values())
+    tot_use_cases = ast.literal_eval(config["use_cases"]["topics_over_time"])
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--use-case",
+        action="append",
+        choices=use_cases,
+        help="use case to build (repeatable, default: all)",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="rebuild even if inputs are unchanged, and replace curated artifacts",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    buildable = [
+        use_case
+        for use_case in use_cases
+        if os.path.exists(os.path.join(DATA_PATH, use_case, "data.xlsx"))
+    ]
+    missing = sorted(set(args.use_case or []) - set(buildable))
+    if missing:
+        parser.error(
+            f"no data.xlsx for {', '.join(missing)}, "
+            f"only {', '.join(buildable)} can be built"
+        )
+    for use_case in sorted(set(use_cases) - set(buildable)):
+        logging.warning(f"{use_case}: no data.xlsx, keeping its prebuilt artifacts")
+
+    settings = _engine_settings(config)
+    time_column = config["build"]["time_column"]
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = {
+            pool.submit(
+                build_use_case,
+                use_case,
+                settings,
+                time_column if use_case in tot_use_cases else None,
+                args.force,
+            ): use_case
+            for use_case in args.use_case or buildable
+        }
+        for future in as_completed(futures):
+            logging.info(f"{futures[future]}: {future.result()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+_CACHE_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "smartcluster", ".cache"
+)
+# version of the cache file layout, part of the cache file names
+_FORMAT = 2
+# text columns with at most this share of distinct values become categorical
+_CATEGORICAL_RATIO = 0.5
+# the topic columns of the last build, next to the data.xlsx of a use case
+DOCUMENT_TOPICS = "document_topics.xlsx"
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def _to_arrow(frame: pd.DataFrame) -> pa.Table:
+    for column in frame.columns:
+        if frame[column].dtype != object:
+            continue
+        # Excel columns like "fine_topics" can mix numbers and strings, which
+        # Arrow cannot store in one column
+        if pd.api.types.infer_dtype(frame[column], skipna=True).startswith("mixed"):
+            frame[column] = frame[column].where(
+                frame[column].isna(), frame[column].astype(str)
+            )
+        # topics, tags and colors repeat: store every value once (sorted, so
+        # that sorting by the codes sorts by the values)
+        if frame[column].nunique() <= _CATEGORICAL_RATIO * len(frame):
+            frame[column] = frame[column].astype("category")
+    return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _string_dtype(type_: pa.DataType):
+    # text stays in the Arrow buffers of the memory-mapped file instead of
+    # becoming one Python object per cell
+    return pd.StringDtype("pyarrow") if type_ == pa.string() else None
+
+
+def as_text(column: pd.Series) -> pd.Series:
+    """The cells as ``str``, missing ones as ``"None"``.
+
+    Use it instead of ``astype(str)``, which turns Arrow-backed text into a
+    fixed-width array as wide as the longest cell.
+    """
+    if isinstance(column.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        column = column.astype(object)
+        column = column.where(column.notna(), None)
+    return column.astype(str)
+
+
+def column_view(frame: pd.DataFrame, columns: dict[str, str]) -> pd.DataFrame:
+    """The ``columns`` (new name -> column) of a stored frame, without a copy."""
+    return pd.DataFrame(
+        {name: frame[column] for name, column in columns.items()}, copy=False
+    )
+
+
+class FrameStore:
+    """Process-wide store of the Smart Cluster workbooks.
+
+    Every workbook is parsed with openpyxl only once: it is converted to an
+    uncompressed Arrow/Feather file in ``cache_dir`` named after the hash of
+    the workbook, and that file is memory-mapped on later loads. Text columns
+    are backed by the mapped Arrow buffers and repetitive ones are
+    categorical, so a frame costs little more than its file and only the pages
+    that are read are in memory. Loaded frames are shared by all sessions and
+    must be treated as read-only; use ``column_view`` to select and rename
+    columns without copying them.
+    """
+
+    def __init__(self, cache_dir=_CACHE_DIR):
+        self.__cache_dir = cache_dir
+        self.__frames = {}
+        self.__locks = {}
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.conversions = 0
+
+    def get(self, path: str) -> pd.DataFrame:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.__lock:
+            entry = self.__frames.get(path)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            lock = self.__locks.setdefault(path, threading.Lock())
+        with lock:
+            with self.__lock:
+                entry = self.__frames.get(path)
+                if entry is not None and entry[0] == version:
+                    self.hits += 1
+                    return entry[1]
+            frame = self.__load(path)
+            with self.__lock:
+                self.__frames[path] = (version, frame)
+            return frame
+
+    def stats(self) -> dict:
+        with self.__lock:
+            frames = [frame for _, frame in self.__frames.values()]
+            stats = {
+                "frames": len(frames),
+                "hits": self.hits,
+                "loads": self.loads,
+                "conversions": self.conversions,
+            }
+        stats["bytes"] = int(
+            sum(frame.memory_usage(index=False).sum() for frame in frames)
+        )
+        return stats
+
+    def __load(self, path: str) -> pd.DataFrame:
+        # one cache file per workbook path, versioned by the workbook content
+        path_hash = hashlib.sha256(path.encode("utf-8")).hexdigest()[:8]
+        stem = f"{os.path.splitext(os.path.basename(path))[0]}_{path_hash}"
+        cached = os.path.join(
+            self.__cache_dir, f"{stem}-{_file_hash(path)}-v{_FORMAT}.arrow"
+        )
+        if not os.path.exists(cached):
+            self.__convert(path, stem, cached)
+        logging.info(f"Loading {path} from {cached}")
+        with self.__lock:
+            self.loads += 1
+        return feather.read_table(cached, memory_map=True).to_pandas(
+            types_mapper=_string_dtype
+        )
+
+    def __convert(self, path: str, stem: str, cached: str):
+        logging.info(f"Converting {path} to {cached}")
+        os.makedirs(self.__cache_dir, exist_ok=True)
+        table = _to_arrow(pd.read_excel(path))
+        # unique per process and thread, as several app or build processes may
+        # convert the same workbook at once
+        tmp = f"{cached}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, cached)
+        with self.__lock:
+            self.conversions += 1
+        for name in os.listdir(self.__cache_dir):
+            outdated = os.path.join(self.__cache_dir, name)
+            # temporary files belong to conversions that are still running
+            if (
+                name.startswith(f"{stem}-")
+                and not name.endswith(".tmp")
+                and outdated != cached
+            ):
+                try:
+                    os.remove(outdated)
+                except FileNotFoundError:
+                    # removed by another process
+                    pass
+
+
+_STORE = FrameStore()
+
+
+def get_frame(path: str) -> pd.DataFrame:
+    return _STORE.get(path)
+
+
+def get_documents(use_case_path: str) -> pd.DataFrame:
+    """The ``data.xlsx`` of a use case with the topic columns of its last build.
+
+    ``cluster.build`` leaves ``data.xlsx`` untouched and writes the topic
+    columns to ``document_topics.xlsx``; they replace the ones of ``data.xlsx``
+    as long as both have the same documents.
+    """
+    data = get_frame(os.path.join(use_case_path, "data.xlsx"))
+    path = os.path.join(use_case_path, DOCUMENT_TOPICS)
+    if not os.path.exists(path):
+        return data
+    topics = get_frame(path)
+    if len(topics) != len(data):
+        logging.warning(f"Ignoring {path}, it does not match the documents")
+        return data
+    columns = {column: data[column] for column in data.columns}
+    columns.update({column: topics[column] for column in topics.columns})
+    return pd.DataFrame(columns, copy=False)
+
+
+def frame_store() -> FrameStore:
+    return _STORE
@@ -0,0 +1,52 @@
+import zlib
+from typing import Protocol, Sequence
+
+import numpy as np
+
+from cluster.terms import TermMatrix, term_matrix
+
+
+class Embedder(Protocol):
+    """Turns texts into one embedding vector per text (rows of the result)."""
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder:
+    """Stateless bag-of-words embedder based on signed feature hashing.
+
+    Every term is hashed into one of ``dim`` buckets with a random sign and
+    weighted with ``1 + log(count)``; rows are L2-normalized. The same text
+    always gets the same vector, so documents and queries embedded at different
+    times are comparable. It is a local stand-in for a semantic model, not a
+    replacement: it only captures lexical overlap.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return self.embed_terms(term_matrix(texts))
+
+    def embed_terms(self, terms: TermMatrix) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(t.encode("utf-8")) for t in terms.vocabulary),
+            dtype=np.int64,
+            count=len(terms.vocabulary),
+        )
+        bucket = hashes % self.dim
+        sign = np.where((hashes // self.dim) % 2 == 0, 1.0, -1.0)
+        weights = (1 + np.log(terms.counts)) * sign[terms.term_index]
+        embeddings = np.bincount(
+            terms.doc_index * self.dim + bucket[terms.term_index],
+            weights=weights,
+            minlength=terms.n_docs * self.dim,
+        ).reshape(terms.n_docs, self.dim)
+        return normalize(embeddings.astype(np.float32))
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return embeddings / norms
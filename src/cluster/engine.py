@@ -0,0 +1,279 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from cluster.embedders import Embedder, HashingEmbedder, normalize
+from cluster.terms import term_matrix
+
+OUTLIER_TOPIC = -1
+
+
+class ClusterResult:
+    """Outcome of a clustering run.
+
+    ``documents`` has the columns Name, Content, broad_topics, fine_topics, x and
+    y (the 2D projection). ``topics[granularity]`` is the topic table with the
+    columns Topic, Count and Name, and ``centroids[granularity]`` holds one
+    normalized centroid row per topic id in ``topics[granularity]``.
+    """
+
+    def __init__(self, documents, topics, centroids, topic_words, projection):
+        self.documents = documents
+        self.topics = topics
+        self.centroids = centroids
+        self.topic_words = topic_words
+        self.projection = projection
+
+
+class ClusteringEngine:
+    """Vectorized spherical k-means clustering at two granularities.
+
+    Documents are clustered into ``fine_topics`` topics (iterating until less
+    than ``tolerance`` of the labels change); the fine topic
+    centroids are clustered again into ``broad_topics`` topics, so every fine
+    topic belongs to exactly one broad topic. Documents whose similarity to
+    their centroid is below ``outlier_threshold`` are assigned to topic -1.
+    Similarities are computed as blocked matrix products of at most
+    ``batch_size`` rows, spread over ``n_jobs`` threads. Libraries with fewer
+    documents than topics get one topic per document at most.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder = None,
+        broad_topics=10,
+        fine_topics=40,
+        outlier_threshold=None,
+        max_iter=30,
+        tolerance=1e-3,
+        fit_size=20000,
+        batch_size=8192,
+        n_jobs=None,
+        seed=42,
+    ):
+        if broad_topics < 1 or fine_topics < 1:
+            raise ValueError(
+                f"At least one topic is needed, got {broad_topics} broad and "
+                f"{fine_topics} fine topics"
+            )
+        self.__embedder = embedder if embedder is not None else HashingEmbedder()
+        self.__broad_topics = broad_topics
+        self.__fine_topics = fine_topics
+        self.__outlier_threshold = outlier_threshold
+        self.__max_iter = max_iter
+        self.__tolerance = tolerance
+        self.__fit_size = fit_size
+        self.__batch_size = batch_size
+        self.__n_jobs = n_jobs or os.cpu_count() or 1
+        self.__seed = seed
+
+    def cluster(
+        self,
+        names: Sequence[str],
+        texts: Sequence[str],
+        embeddings: np.ndarray = None,
+    ) -> ClusterResult:
+        if len(texts) == 0:
+            raise ValueError("There are no documents to cluster")
+        if len(names) != len(texts):
+            raise ValueError(f"Got {len(names)} names for {len(texts)} documents")
+        terms = term_matrix(texts)
+        if embeddings is None:
+            logging.info(f"Embedding {len(texts)} documents")
+            if isinstance(self.__embedder, HashingEmbedder):
+                embeddings = self.__embedder.embed_terms(terms)
+            else:
+                embeddings = self.__embedder.embed(texts)
+        x = normalize(np.asarray(embeddings, dtype=np.float32))
+        rng = np.random.default_rng(self.__seed)
+        with ThreadPoolExecutor(max_workers=self.__n_jobs) as pool:
+            logging.info(f"Clustering {x.shape[0]} documents")
+            fine_labels, fine_centroids = self.__kmeans(
+                x, min(self.__fine_topics, x.shape[0]), rng, pool
+            )
+            weights = np.bincount(fine_labels, minlength=fine_centroids.shape[0])
+            fine_to_broad, _ = self.__kmeans(
+                fine_centroids,
+                min(self.__broad_topics, fine_centroids.shape[0]),
+                rng,
+                pool,
+                weights=weights.astype(np.float32),
+            )
+            broad_labels = fine_to_broad[fine_labels]
+            if self.__outlier_threshold is not None:
+                similarity = np.einsum("ij,ij->i", x, fine_centroids[fine_labels])
+                outliers = similarity < self.__outlier_threshold
+            else:
+                outliers = np.zeros(x.shape[0], dtype=bool)
+            projection = project_2d(x)
+
+        documents = pd.DataFrame(
+            {"Name": list(names), "Content": list(texts), "x": projection[:, 0]}
+        )
+        documents["y"] = projection[:, 1]
+        topics, centroids, topic_words = {}, {}, {}
+        for granularity, labels in (("broad", broad_labels), ("fine", fine_labels)):
+            labels = _by_size(labels, outliers)
+            words = topic_terms(terms, labels)
+            table = pd.DataFrame(
+                {"Topic": sorted(words), "Count": 0, "Name": ""}
+            ).set_index("Topic", drop=False)
+            counts = pd.Series(labels).value_counts()
+            table["Count"] = counts.reindex(table.index).fillna(0).astype(int)
+            table["Name"] = ["_".join([str(t)] + words[t][:4]) for t in table["Topic"]]
+            names_by_topic = table["Name"].to_dict()
+            documents[f"{granularity}_topics"] = [names_by_topic[t] for t in labels]
+            topics[granularity] = table.reset_index(drop=True)
+            centroids[granularity] = np.stack(
+                [
+                    _centroid(x, labels, t, fine_centroids.shape[1])
+                    for t in table["Topic"]
+                ]
+            )
+            topic_words[granularity] = words
+        return ClusterResult(documents, topics, centroids, topic_words, projection)
+
+    def __kmeans(self, x, k, rng, pool, weights=None):
+        """Spherical k-means; returns the labels and the normalized centroids.
+
+        The centroids are fitted on a random sample of at most ``fit_size``
+        rows and refined with one pass over all rows.
+        """
+        sample = x
+        sample_weights = weights
+        if x.shape[0] > self.__fit_size:
+            rows = rng.choice(x.shape[0], self.__fit_size, replace=False)
+            sample = x[rows]
+            sample_weights = None if weights is None else weights[rows]
+        centroids = _kmeans_plus_plus(sample, k, rng)
+        labels = None
+        for _ in range(self.__max_iter):
+            new_labels, similarity, sums = self.__assign(
+                sample, centroids, pool, sample_weights
+            )
+            changed = (
+                len(new_labels)
+                if labels is None
+                else np.count_nonzero(labels != new_labels)
+            )
+            labels = new_labels
+            centroids = _update_centroids(sample, sums, similarity)
+            if changed <= self.__tolerance * len(labels):
+                break
+        if sample is not x:
+            _, similarity, sums = self.__assign(x, centroids, pool, weights)
+            centroids = _update_centroids(x, sums, similarity)
+        labels, _, _ = self.__assign(x, centroids, pool, weights)
+        return labels, centroids
+
+    def __assign(self, x, centroids, pool, weights=None):
+        """Label every row with its most similar centroid.
+
+        Also returns the similarity to that centroid and the (weighted) sums of
+        the rows per label, which are the unnormalized new centroids.
+        """
+        k = centroids.shape[0]
+        blocks = range(0, x.shape[0], self.__batch_size)
+
+        def assign_block(start):
+            block = x[start : start + self.__batch_size]
+            labels = (block @ centroids.T).argmax(axis=1)
+            similarity = np.einsum("ij,ij->i", block, centroids[labels])
+            members = np.zeros((k, len(block)), dtype=np.float32)
+            members[labels, np.arange(len(block))] = (
+                1 if weights is None else weights[start : start + len(block)]
+            )
+            return labels, similarity, members @ block
+
+        results = list(pool.map(assign_block, blocks))
+        return (
+            np.concatenate([labels for labels, _, _ in results]),
+            np.concatenate([similarity for _, similarity, _ in results]),
+            np.sum([sums for _, _, sums in results], axis=0),
+        )
+
+
+def _kmeans_plus_plus(x, k, rng, sample_size=10000):
+    if k < 1 or x.shape[0] == 0:
+        raise ValueError(f"Cannot pick {k} centroids from {x.shape[0]} rows")
+    sample = x[rng.choice(x.shape[0], min(sample_size, x.shape[0]), replace=False)]
+    centroids = [sample[rng.integers(len(sample))]]
+    distance = 1 - sample @ centroids[0]
+    for _ in range(1, k):
+        p = np.clip(distance, 0, None)
+        p = p / p.sum() if p.sum() > 0 else None
+        centroids.append(sample[rng.choice(len(sample), p=p)])
+        distance = np.minimum(distance, 1 - sample @ centroids[-1])
+    return np.stack(centroids)
+
+
+def _update_centroids(x, sums, similarity):
+    empty = np.flatnonzero(np.linalg.norm(sums, axis=1) == 0)
+    if len(empty) > 0:
+        # restart empty clusters at the worst assigned rows
+        sums[empty] = x[np.argsort(similarity)[: len(empty)]]
+    return normalize(sums)
+
+
+def _centroid(x, labels, topic, dim):
+    members = labels == topic
+    if not members.any():
+        return np.zeros(dim, dtype=np.float32)
+    return normalize(x[members].sum(axis=0, keepdims=True))[0]
+
+
+def _by_size(labels, outliers):
+    """Renumber topics by descending size (0 is the largest), outliers get -1."""
+    counts = np.bincount(labels[~outliers], minlength=labels.max() + 1)
+    rank = np.empty_like(counts)
+    rank[np.argsort(-counts, kind="stable")] = np.arange(len(counts))
+    renumbered = rank[labels]
+    renumbered[outliers] = OUTLIER_TOPIC
+    return renumbered
+
+
+def project_2d(x: np.ndarray) -> np.ndarray:
+    """Project the rows of ``x`` onto their first two principal components."""
+    centered = x - x.mean(axis=0)
+    _, vectors = np.linalg.eigh(centered.T @ centered)
+    return centered @ vectors[:, [-1, -2]]
+
+
+def topic_terms(terms, labels, top_n=10) -> dict[int, list[str]]:
+    """Most representative words per topic, ranked by class-based TF-IDF."""
+    topic_ids = np.unique(labels)
+    position = np.searchsorted(topic_ids, labels[terms.doc_index])
+    vocabulary_size = len(terms.vocabulary)
+    frequencies = np.bincount(
+        position * vocabulary_size + terms.term_index,
+        weights=terms.counts,
+        minlength=len(topic_ids) * vocabulary_size,
+    ).reshape(len(topic_ids), vocabulary_size)
+    words_per_topic = frequencies.sum(axis=1, keepdims=True)
+    words_per_topic[words_per_topic == 0] = 1
+    idf = np.log(1 + frequencies.sum(axis=1).mean() / (frequencies.sum(axis=0) + 1))
+    scores = frequencies / words_per_topic * idf
+    top_n = min(top_n, vocabulary_size)
+    if top_n == 0:
+        return {int(t): [] for t in topic_ids}
+    best = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    best = np.take_along_axis(
+        best, np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1), axis=1
+    )
+    return {
+        int(t): [str(w) for w in terms.vocabulary[row]]
+        for t, row in zip(topic_ids, best)
+    }
+
+
+def cluster_library(connector, domain: str, engine: ClusteringEngine, tags=None):
+    """Cluster a live library of a semantha® domain."""
+    names, texts = [], []
+    for record in connector.iter_library(domain, tags=tags):
+        names.append(record["doc_name"])
+        texts.append(record["content"])
+    return engine.cluster(names, texts)
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from semantha.cache import LRUCache
+
+_ARRAY_KEYS = ("x", "y", "text", "hovertext", "customdata", "ids")
+_MARKER_KEYS = ("color", "size", "opacity", "symbol")
+
+
+def _read_figure(path: str) -> go.Figure:
+    with open(path, "r") as f:
+        data = json.load(f)
+    # the figures were stored as a JSON-encoded JSON string
+    if isinstance(data, str):
+        return pio.from_json(data)
+    return go.Figure(data)
+
+
+def _sample(values, index: np.ndarray):
+    if isinstance(values, (list, tuple, np.ndarray)):
+        return np.asarray(values, dtype=object)[index].tolist()
+    return values
+
+
+def _shrink_trace(trace: dict, index: np.ndarray, max_hover_chars: int):
+    for key in _ARRAY_KEYS:
+        if key in trace and index is not None:
+            trace[key] = _sample(trace[key], index)
+    marker = trace.get("marker")
+    if isinstance(marker, dict) and index is not None:
+        for key in _MARKER_KEYS:
+            if isinstance(marker.get(key), (list, tuple)):
+                marker[key] = _sample(marker[key], index)
+    for key in ("x", "y"):
+        if isinstance(trace.get(key), (list, tuple, np.ndarray)):
+            values = np.asarray(trace[key])
+            if values.dtype.kind == "f":
+                trace[key] = np.round(values, 3).tolist()
+    if max_hover_chars and isinstance(trace.get("hovertext"), (list, tuple)):
+        trace["hovertext"] = [
+            h
+            if not isinstance(h, str) or len(h) <= max_hover_chars
+            else h[:max_hover_chars] + "…"
+            for h in trace["hovertext"]
+        ]
+
+
+def shrink_figure(
+    figure: go.Figure, max_points: int = None, max_hover_chars: int = None
+) -> go.Figure:
+    """Downsample large scatter traces and trim their payload.
+
+    Traces are thinned with an even stride, proportionally to their size, so
+    that the figure holds at most ``max_points`` points. Coordinates are rounded
+    and hover texts are cut after ``max_hover_chars`` characters.
+    """
+    data = figure.to_plotly_json()
+    traces = data["data"]
+    sizes = [
+        len(t["x"]) if t.get("type", "").startswith("scatter") and "x" in t else 0
+        for t in traces
+    ]
+    total = sum(sizes)
+    for trace, size in zip(traces, sizes):
+        index = None
+        if max_points and total > max_points and size > 0:
+            keep = max(1, int(size * max_points / total))
+            index = np.unique(np.linspace(0, size - 1, keep).astype(int))
+        _shrink_trace(trace, index, max_hover_chars)
+    return go.Figure(data)
+
+
+class FigureStore:
+    """Process-wide, bounded cache of decoded Smart Cluster figures.
+
+    Each figure file is decoded (and optionally shrunk) once per process, on the
+    first request for it.
+    """
+
+    def __init__(self, max_entries=24, max_points=None, max_hover_chars=None):
+        self.__figures = LRUCache(max_entries=max_entries)
+        self.__max_points = max_points
+        self.__max_hover_chars = max_hover_chars
+
+    def get(self, path: str):
+        """Return the figure stored at ``path`` or ``None`` if there is none."""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        figure = self.__figures.get(key)
+        if figure is None:
+            logging.info(f"Decoding figure {path}")
+            figure = _read_figure(path)
+            if self.__max_points or self.__max_hover_chars:
+                figure = shrink_figure(
+                    figure, self.__max_points, self.__max_hover_chars
+                )
+            self.__figures.put(key, figure)
+        return figure
+
+    def stats(self) -> dict:
+        return self.__figures.stats()
+
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def figure_store(max_entries=24, max_points=None, max_hover_chars=None):
+    """Return the shared store for the given settings."""
+    key = (max_entries, max_points, max_hover_chars)
+    with _STORES_LOCK:
+        if key not in _STORES:
+            _STORES[key] = FigureStore(max_entries, max_points, max_hover_chars)
+        return _STORES[key]
@@ -0,0 +1,116 @@
+import pandas as pd
+import plotly.graph_objects as go
+
+from cluster.engine import OUTLIER_TOPIC, ClusterResult
+
+
+def _trim(texts, max_chars):
+    return [t if len(t) <= max_chars else t[:max_chars] + "…" for t in texts]
+
+
+def document_map(
+    result: ClusterResult, granularity: str, max_hover_chars=300
+) -> go.Figure:
+    """All documents in 2D, one trace per topic (outliers in grey)."""
+    documents = result.documents
+    column = f"{granularity}_topics"
+    figure = go.Figure()
+    for name, group in documents.groupby(column, sort=False):
+        outlier = name.startswith(f"{OUTLIER_TOPIC}_")
+        figure.add_trace(
+            go.Scattergl(
+                x=group["x"].round(3),
+                y=group["y"].round(3),
+                mode="markers",
+                name="other" if outlier else name,
+                showlegend=not outlier,
+                hoverinfo="text",
+                hovertext=_trim(group["Content"].astype(str), max_hover_chars),
+                marker=dict(size=5, opacity=0.5, color="#CFD8DC" if outlier else None),
+            )
+        )
+    figure.update_layout(
+        template="simple_white",
+        height=750,
+        title="<b>Documents and Topics</b>",
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+    )
+    return figure
+
+
+def topic_map(result: ClusterResult, granularity: str) -> go.Figure:
+    """Intertopic map: topic centers in 2D, sized by the number of documents."""
+    documents = result.documents
+    topics = result.topics[granularity]
+    topics = topics[topics["Topic"] != OUTLIER_TOPIC]
+    centers = documents.groupby(f"{granularity}_topics")[["x", "y"]].mean()
+    centers = centers.reindex(topics["Name"])
+    words = [
+        " | ".join(result.topic_words[granularity][t][:5]) for t in topics["Topic"]
+    ]
+    figure = go.Figure(
+        go.Scatter(
+            x=centers["x"].round(3),
+            y=centers["y"].round(3),
+            mode="markers",
+            customdata=[
+                [int(t), w, int(c)]
+                for t, w, c in zip(topics["Topic"], words, topics["Count"])
+            ],
+            hovertemplate="<b>Topic %{customdata[0]}</b><br>%{customdata[1]}"
+            "<br>Size: %{customdata[2]}<extra></extra>",
+            marker=dict(
+                size=topics["Count"],
+                sizemode="area",
+                sizeref=2.0 * max(topics["Count"].max(), 1) / 60**2,
+                color="#B0BEC5",
+                line=dict(width=2, color="DarkSlateGrey"),
+            ),
+        )
+    )
+    figure.update_layout(
+        template="simple_white",
+        height=650,
+        title="<b>Intertopic Distance Map</b>",
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+    )
+    return figure
+
+
+def topics_over_time(
+    result: ClusterResult, granularity: str, timestamps, top_n=10
+) -> go.Figure:
+    """Number of documents per topic and time step for the largest topics."""
+    column = f"{granularity}_topics"
+    topics = result.topics[granularity]
+    largest = topics[topics["Topic"] != OUTLIER_TOPIC].nlargest(top_n, "Count")
+    counts = (
+        pd.DataFrame(
+            {"Topic": result.documents[column].values, "Time": list(timestamps)}
+        )
+        .groupby(["Topic", "Time"])
+        .size()
+    )
+    figure = go.Figure()
+    for name in largest["Name"]:
+        series = counts.loc[name] if name in counts.index else pd.Series(dtype=int)
+        figure.add_trace(
+            go.Scatter(
+                x=series.index.tolist(),
+                y=series.values.tolist(),
+                mode="lines",
+                name=name,
+                hoverinfo="text",
+                hovertext=[f"<b>{name}</b><br>Frequency: {c}" for c in series.values],
+            )
+        )
+    figure.update_layout(
+        template="simple_white",
+        height=450,
+        title="<b>Topics over Time</b>",
+        yaxis_title="Frequency",
+        hoverlabel=dict(bgcolor="white"),
+    )
+    return figure
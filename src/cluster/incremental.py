@@ -0,0 +1,435 @@
+"""Assign new documents of a use case to its existing topics.
+
+Run from the repository root::
+
+    PYTHONPATH=src python -m cluster.incremental --use-case newsticker new_items.xlsx
+
+The new documents (columns ``Name``, ``Content`` and the time column of the
+config) are embedded and assigned to the most similar broad and fine topic
+centroid in one matrix product; documents that are not similar enough to any
+centroid (``outlier_threshold``) become outliers. The topic counts, the
+topic sizes of the intertopic maps, the document maps and the topics over time
+are updated in place, and the documents are appended to ``incremental.csv`` of
+the use case. When more than ``drift_threshold`` of the new documents are
+outliers, the topics no longer describe the feed and the use case should be
+rebuilt with ``cluster.build``.
+
+The centroids are kept in ``topic_model.npz`` of the use case. ``cluster.build``
+writes it; for artifacts built elsewhere it is derived once from the topic
+columns of the documents and the document maps.
+"""
+import argparse
+import ast
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from cluster.data_store import as_text, get_documents
+from cluster.embedders import Embedder, HashingEmbedder, normalize
+from cluster.engine import OUTLIER_TOPIC, ClusterResult
+
+GRANULARITIES = ("broad", "fine")
+MODEL = "topic_model.npz"
+INCREMENTS = "incremental.csv"
+_TOPIC_ID = re.compile(r"^(-?\d+)(?:_|$)")
+# how many of the most similar topics place a new document on the map
+_NEIGHBOURS = 3
+# model path -> ((mtime, size) of the model file, outlier rate)
+_OUTLIER_RATES = {}
+_OUTLIER_RATES_LOCK = threading.Lock()
+
+
+def topic_id(name: str) -> int:
+    """Topic id of a topic or trace name like ``3_ai_and_of`` (or a bare id).
+
+    Names without an id, like the ``other`` trace of a document map, are -1.
+    """
+    match = _TOPIC_ID.match(str(name))
+    return int(match.group(1)) if match else OUTLIER_TOPIC
+
+
+class TopicModel:
+    """Topic centroids and map centers of one use case, per granularity.
+
+    ``ids[g]``, ``names[g]``, ``centroids[g]`` (normalized rows) and
+    ``centers[g]`` (the topic's mean position on the document map) are aligned
+    and leave out the outlier topic. ``documents`` and ``outliers`` count the
+    documents added since the topics were built.
+    """
+
+    def __init__(self, ids, names, centroids, centers, documents=0, outliers=0):
+        self.ids = ids
+        self.names = names
+        self.centroids = centroids
+        self.centers = centers
+        self.documents = documents
+        self.outliers = outliers
+
+    @classmethod
+    def from_result(cls, result: ClusterResult) -> "TopicModel":
+        ids, names, centroids, centers = {}, {}, {}, {}
+        for g in GRANULARITIES:
+            topics = result.topics[g]
+            keep = (topics["Topic"] != OUTLIER_TOPIC).to_numpy()
+            ids[g] = topics["Topic"].to_numpy()[keep]
+            names[g] = topics["Name"].to_numpy(dtype=str)[keep]
+            centroids[g] = result.centroids[g][keep]
+            positions = result.documents.groupby(f"{g}_topics")[["x", "y"]].mean()
+            centers[g] = positions.reindex(names[g]).fillna(0).to_numpy()
+        return cls(ids, names, centroids, centers)
+
+    @classmethod
+    def derive(cls, use_case_path: str, embedder: Embedder = None) -> "TopicModel":
+        """Rebuild the centroids from the topic columns of the documents."""
+        embedder = embedder if embedder is not None else HashingEmbedder()
+        data = get_documents(use_case_path)
+        x = embedder.embed(as_text(data["Content"]).tolist())
+        ids, names, centroids, centers = {}, {}, {}, {}
+        for g in GRANULARITIES:
+            topics = _read_topics(use_case_path, g)
+            topics = topics[topics["Topic"] != OUTLIER_TOPIC]
+            labels = as_text(data[f"{g}_topics"]).map(topic_id).to_numpy()
+            position = pd.Index(topics["Topic"]).get_indexer(labels)
+            members = position >= 0
+            sums = np.zeros((len(topics), x.shape[1]), dtype=np.float32)
+            np.add.at(sums, position[members], x[members])
+            ids[g] = topics["Topic"].to_numpy()
+            names[g] = topics["Name"].to_numpy(dtype=str)
+            centroids[g] = normalize(sums)
+            centers[g] = _map_centers(_read_figure(use_case_path, g, "doc_map"), ids[g])
+        return cls(ids, names, centroids, centers)
+
+    @classmethod
+    def load(cls, path: str) -> "TopicModel":
+        with np.load(path) as f:
+            return cls(
+                *(
+                    {g: f[f"{g}_{key}"] for g in GRANULARITIES}
+                    for key in ("ids", "names", "centroids", "centers")
+                ),
+                documents=int(f["documents"]),
+                outliers=int(f["outliers"]),
+            )
+
+    def save(self, path: str):
+        arrays = {
+            f"{g}_{key}": getattr(self, key)[g]
+            for g in GRANULARITIES
+            for key in ("ids", "names", "centroids", "centers")
+        }
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, documents=self.documents, outliers=self.outliers, **arrays)
+        os.replace(tmp, path)
+
+    @property
+    def outlier_rate(self) -> float:
+        return self.outliers / self.documents if self.documents else 0.0
+
+    def assign(self, x: np.ndarray, granularity: str):
+        """Nearest topic ids, their similarity and the map positions of ``x``.
+
+        A document is placed at the similarity-weighted mean of the centers of
+        its most similar topics.
+        """
+        similarity = x @ self.centroids[granularity].T
+        best = similarity.argmax(axis=1)
+        k = min(_NEIGHBOURS, similarity.shape[1])
+        nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        weights = np.clip(np.take_along_axis(similarity, nearest, axis=1), 1e-6, None)
+        positions = np.einsum(
+            "ij,ijk->ik", weights, self.centers[granularity][nearest]
+        ) / weights.sum(axis=1, keepdims=True)
+        return (
+            self.ids[granularity][best],
+            similarity[np.arange(len(x)), best],
+            positions,
+        )
+
+
+class UpdateReport:
+    def __init__(self, documents, outliers, topics, drift, outlier_rate):
+        self.documents = documents
+        self.outliers = outliers
+        # granularity -> number of new documents per topic id
+        self.topics = topics
+        self.drift = drift
+        self.outlier_rate = outlier_rate
+
+
+def load_model(use_case_path: str) -> TopicModel:
+    path = os.path.join(use_case_path, MODEL)
+    if os.path.exists(path):
+        return TopicModel.load(path)
+    if not os.path.exists(os.path.join(use_case_path, "data.xlsx")):
+        raise FileNotFoundError(
+            f"{use_case_path} has neither a {MODEL} nor a data.xlsx to derive it "
+            f"from, add its documents as data.xlsx and build it with cluster.build"
+        )
+    logging.info(f"Deriving the topic model of {use_case_path}")
+    model = TopicModel.derive(use_case_path)
+    model.save(path)
+    return model
+
+
+def has_drifted(use_case_path: str, drift_threshold: float) -> bool:
+    """Whether too many of the documents added since the build fit no topic.
+
+    The outlier rate is read once per version of the model file, so that the
+    pages can ask on every rerun.
+    """
+    path = os.path.join(use_case_path, MODEL)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _OUTLIER_RATES_LOCK:
+        cached = _OUTLIER_RATES.get(path)
+    if cached is None or cached[0] != version:
+        with np.load(path) as f:
+            documents, outliers = int(f["documents"]), int(f["outliers"])
+        cached = (version, outliers / documents if documents else 0.0)
+        with _OUTLIER_RATES_LOCK:
+            _OUTLIER_RATES[path] = cached
+    return cached[1] > drift_threshold
+
+
+def add_documents(
+    use_case_path: str,
+    documents: pd.DataFrame,
+    time_column: str,
+    outlier_threshold: float,
+    drift_threshold: float,
+    embedder: Embedder = None,
+) -> UpdateReport:
+    """Assign ``documents`` to the topics of a use case and update its artifacts."""
+    embedder = embedder if embedder is not None else HashingEmbedder()
+    model = load_model(use_case_path)
+    documents = documents.reset_index(drop=True)
+    x = embedder.embed(documents["Content"].astype(str).tolist())
+    appended = documents[["Name", "Content", time_column]].copy()
+    assignments = {g: model.assign(x, g) for g in GRANULARITIES}
+    # as in the clustering, a document too far from its fine topic is an
+    # outlier in both granularities
+    is_outlier = assignments["fine"][1] < outlier_threshold
+    outliers = int(np.count_nonzero(is_outlier))
+    topics = {}
+    for g, (ids, _, positions) in assignments.items():
+        ids[is_outlier] = OUTLIER_TOPIC
+        names = dict(zip(model.ids[g], model.names[g]))
+        appended[f"{g}_topics"] = [names.get(t, f"{OUTLIER_TOPIC}_other") for t in ids]
+        _update_topic_counts(use_case_path, g, ids)
+        _update_topic_map(use_case_path, g, ids)
+        _update_document_map(use_case_path, g, ids, positions, documents["Content"])
+        _update_topics_over_time(use_case_path, g, ids, documents[time_column])
+        topics[g] = pd.Series(ids).value_counts().sort_index().to_dict()
+    rate = outliers / len(documents) if len(documents) else 0.0
+    model.documents += len(documents)
+    model.outliers += outliers
+    model.save(os.path.join(use_case_path, MODEL))
+    increments = os.path.join(use_case_path, INCREMENTS)
+    appended.to_csv(
+        increments, mode="a", header=not os.path.exists(increments), index=False
+    )
+    drift = rate > drift_threshold
+    if drift:
+        logging.warning(
+            f"{outliers} of {len(documents)} new documents of {use_case_path} fit "
+            f"no topic, consider rebuilding it with cluster.build"
+        )
+    return UpdateReport(len(documents), outliers, topics, drift, model.outlier_rate)
+
+
+def _read_topics(use_case_path, granularity) -> pd.DataFrame:
+    path = os.path.join(use_case_path, granularity, f"{granularity}_excel.xlsx")
+    return pd.read_excel(path, index_col=0)
+
+
+def _figure_path(use_case_path, granularity, type_):
+    return os.path.join(use_case_path, granularity, f"{granularity}_{type_}.json")
+
+
+def _read_figure(use_case_path, granularity, type_):
+    """The figure as plain JSON data, or ``None`` if there is none."""
+    path = _figure_path(use_case_path, granularity, type_)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "r") as f:
+        data = json.load(f)
+    # some figures were stored as a JSON-encoded JSON string
+    return json.loads(data) if isinstance(data, str) else data
+
+
+def _write_figure(use_case_path, granularity, type_, figure: dict):
+    path = _figure_path(use_case_path, granularity, type_)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(pio.to_json(figure, validate=False))
+    os.replace(f"{path}.tmp", path)
+
+
+def _map_centers(figure, ids) -> np.ndarray:
+    centers = np.zeros((len(ids), 2))
+    if figure is None:
+        return centers
+    by_id = {
+        topic_id(trace.get("name")): trace
+        for trace in figure["data"]
+        if trace.get("x") is not None
+    }
+    for i, t in enumerate(ids):
+        if t in by_id and len(by_id[t]["x"]):
+            centers[i] = np.mean(by_id[t]["x"]), np.mean(by_id[t]["y"])
+    return centers
+
+
+def _update_topic_counts(use_case_path, granularity, ids):
+    topics = _read_topics(use_case_path, granularity)
+    added = pd.Series(ids).value_counts()
+    topics["Count"] += topics["Topic"].map(added).fillna(0).astype(int)
+    path = os.path.join(use_case_path, granularity, f"{granularity}_excel.xlsx")
+    topics.to_excel(path)
+
+
+def _update_document_map(use_case_path, granularity, ids, positions, contents):
+    figure = _read_figure(use_case_path, granularity, "doc_map")
+    if figure is None:
+        return
+    traces = {topic_id(trace.get("name")): trace for trace in figure["data"]}
+    if OUTLIER_TOPIC in ids and OUTLIER_TOPIC not in traces:
+        # maps built without outliers have no trace for them yet
+        traces[OUTLIER_TOPIC] = _outlier_trace()
+        figure["data"].insert(0, traces[OUTLIER_TOPIC])
+    contents = contents.astype(str).to_numpy()
+    for t in np.unique(ids):
+        trace = traces.get(t)
+        if trace is None:
+            continue
+        rows = ids == t
+        size = len(trace["x"])
+        for key, values in (
+            ("x", positions[rows, 0].round(3).tolist()),
+            ("y", positions[rows, 1].round(3).tolist()),
+            ("hovertext", contents[rows].tolist()),
+            ("text", [""] * int(rows.sum())),
+        ):
+            # only per-point arrays grow with the trace
+            if isinstance(trace.get(key), list) and len(trace[key]) == size:
+                trace[key] = trace[key] + values
+    _write_figure(use_case_path, granularity, "doc_map", figure)
+
+
+def _outlier_trace() -> dict:
+    """An empty outlier trace like the ones of ``figures.document_map``."""
+    return {
+        "type": "scattergl",
+        "x": [],
+        "y": [],
+        "mode": "markers",
+        "name": "other",
+        "showlegend": False,
+        "hoverinfo": "text",
+        "hovertext": [],
+        "marker": {"size": 5, "opacity": 0.5, "color": "#CFD8DC"},
+    }
+
+
+def _update_topic_map(use_case_path, granularity, ids):
+    """Grow the topic sizes of the intertopic map.
+
+    The points carry ``[topic id, words, size]`` as custom data and are sized by
+    the number of documents; the size reference keeps the largest topic at the
+    same marker size.
+    """
+    figure = _read_figure(use_case_path, granularity, "map")
+    if figure is None:
+        return
+    added = pd.Series(ids[ids != OUTLIER_TOPIC]).value_counts()
+    for trace in figure["data"]:
+        customdata = trace.get("customdata")
+        if not isinstance(customdata, list) or not customdata:
+            continue
+        marker = trace.get("marker") or {}
+        sizes = marker.get("size")
+        if not isinstance(sizes, list) or len(sizes) != len(customdata):
+            sizes = None
+        largest = max(sizes) if sizes else 0
+        for i, row in enumerate(customdata):
+            grown = int(added.get(topic_id(row[0]), 0))
+            if len(row) > 2:
+                row[2] += grown
+            if sizes is not None:
+                sizes[i] += grown
+        if sizes and largest and isinstance(marker.get("sizeref"), (int, float)):
+            marker["sizeref"] *= max(sizes) / largest
+    _write_figure(use_case_path, granularity, "map", figure)
+
+
+def _update_topics_over_time(use_case_path, granularity, ids, times):
+    figure = _read_figure(use_case_path, granularity, "tot")
+    if figure is None:
+        return
+    counts = pd.DataFrame({"Topic": ids, "Time": times.to_numpy()})
+    counts = counts[counts["Topic"] != OUTLIER_TOPIC].groupby(["Topic", "Time"]).size()
+    for trace in figure["data"]:
+        t = topic_id(trace.get("name"))
+        if t not in counts.index.get_level_values(0):
+            continue
+        series = pd.Series(trace["y"], index=trace["x"], dtype=int)
+        series = series.add(counts.loc[t], fill_value=0).astype(int).sort_index()
+        hover = dict(zip(trace["x"], trace.get("hovertext") or []))
+        label = next(iter(hover.values()), f"<b>{trace.get('name')}</b>")
+        trace["x"] = series.index.tolist()
+        trace["y"] = series.tolist()
+        if "hovertext" in trace:
+            trace["hovertext"] = [hover.get(x, label) for x in trace["x"]]
+    _write_figure(use_case_path, granularity, "tot", figure)
+
+
+def main(argv=None):
+    from cluster.build import DATA_PATH, read_config
+
+    config = read_config()
+    use_cases = ast.literal_eval(config["use_cases"]["topics_over_time"])
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--use-case", required=True, choices=use_cases)
+    parser.add_argument("documents", help="CSV or Excel file with the new documents")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    use_case_path = os.path.join(DATA_PATH, args.use_case)
+    if not any(
+        os.path.exists(os.path.join(use_case_path, name))
+        for name in (MODEL, "data.xlsx")
+    ):
+        parser.error(
+            f"{args.use_case} has no documents to derive its topic model from, "
+            f"add them as data.xlsx and run cluster.build first"
+        )
+
+    if args.documents.endswith(".csv"):
+        documents = pd.read_csv(args.documents)
+    else:
+        documents = pd.read_excel(args.documents)
+    report = add_documents(
+        use_case_path,
+        documents,
+        config["build"]["time_column"],
+        float(config["engine"]["outlier_threshold"]),
+        float(config["incremental"]["drift_threshold"]),
+    )
+    logging.info(
+        f"{args.use_case}: {report.documents} documents added, "
+        f"{report.outliers} outliers"
+        + (" - DRIFT, rebuild with cluster.build" if report.drift else "")
+    )
+    return 1 if report.drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
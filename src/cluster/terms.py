@@ -0,0 +1,54 @@
+import re
+
+import numpy as np
+
+_TOKEN = re.compile(r"(?u)\b\w\w+\b")
+
+STOP_WORDS = frozenset(
+    """
+    a about after all also am an and any are as at be been but by can could de
+    den der des did die do does das dem ein eine einer for from had has have he
+    her his how i if im in into is ist it its mit more most my nicht no not of
+    on or our she so some such than that the their them then there these
+    they this those to und up us von was we were what when which who will with
+    would you your zu
+    """.split()
+)
+
+
+class TermMatrix:
+    """Sparse document-term occurrences of a corpus in coordinate form.
+
+    ``doc_index[i]`` and ``term_index[i]`` describe one (document, term) pair and
+    ``counts[i]`` how often the term occurs in that document.
+    """
+
+    def __init__(self, doc_index, term_index, counts, vocabulary, n_docs):
+        self.doc_index = doc_index
+        self.term_index = term_index
+        self.counts = counts
+        self.vocabulary = vocabulary
+        self.n_docs = n_docs
+
+
+def term_matrix(texts, stop_words=STOP_WORDS) -> TermMatrix:
+    vocabulary = {}
+    doc_index = []
+    term_index = []
+    for i, text in enumerate(texts):
+        tokens = [t for t in _TOKEN.findall(str(text).lower()) if t not in stop_words]
+        doc_index.extend([i] * len(tokens))
+        term_index.extend([vocabulary.setdefault(t, len(vocabulary)) for t in tokens])
+    doc_index = np.asarray(doc_index, dtype=np.int64)
+    term_index = np.asarray(term_index, dtype=np.int64)
+    # merge repeated tokens of a document into one entry with its count
+    pairs, counts = np.unique(
+        doc_index * max(len(vocabulary), 1) + term_index, return_counts=True
+    )
+    return TermMatrix(
+        pairs // max(len(vocabulary), 1),
+        pairs % max(len(vocabulary), 1),
+        counts.astype(np.float32),
+        np.asarray(list(vocabulary), dtype=object),
+        len(texts),
+    )
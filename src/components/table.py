@@ -0,0 +1,75 @@
+import math
+from typing import Callable, Sequence
+
+import pandas as pd
+import streamlit as st
+
+# load(offset, limit, sort_by, descending) -> the rows of one page
+PageLoader = Callable[[int, int, str, bool], pd.DataFrame]
+
+
+def frame_loader(frame: pd.DataFrame) -> PageLoader:
+    """Page through (and sort) a DataFrame that is held in memory."""
+
+    def load(offset, limit, sort_by, descending):
+        if sort_by is None:
+            return frame.iloc[offset : offset + limit]
+        # positions of the rows in sort order, ties keep their original order
+        order = (
+            frame[sort_by]
+            .reset_index(drop=True)
+            .sort_values(ascending=not descending, kind="stable")
+            .index
+        )
+        return frame.iloc[order[offset : offset + limit]]
+
+    return load
+
+
+def paged_table(
+    key: str,
+    load: PageLoader,
+    total: int,
+    page_size=25,
+    sort_columns: Sequence[str] = (),
+    html_columns: Sequence[str] = (),
+    index_name: str = None,
+):
+    """Render one page of a table; paging and sorting happen on the server.
+
+    Only the ``page_size`` rows of the current page are loaded, transformed
+    and sent to the browser, so large tables render as fast as small ones.
+    Line breaks in ``html_columns`` are replaced by ``<br>``.
+    """
+    pages = max(math.ceil(total / page_size), 1)
+    sort_col, order_col, page_col = st.columns([2, 1, 1])
+    sort_by = None
+    descending = False
+    if sort_columns:
+        sort_by = sort_col.selectbox(
+            "Sort by", ["-"] + list(sort_columns), key=f"{key}_sort_by"
+        )
+        sort_by = None if sort_by == "-" else sort_by
+        descending = (
+            order_col.selectbox(
+                "Order",
+                ["Ascending", "Descending"],
+                key=f"{key}_order",
+                disabled=sort_by is None,
+            )
+            == "Descending"
+        )
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_col.number_input(
+        "Page", min_value=1, max_value=pages, step=1, key=f"{key}_page"
+    )
+    offset = (page - 1) * page_size
+    rows = load(offset, page_size, sort_by, descending).copy()
+    for column in html_columns:
+        rows[column] = rows[column].astype(str).str.replace("\n", "<br>", regex=False)
+    rows.index = pd.RangeIndex(offset + 1, offset + 1 + len(rows), name=index_name)
+    st.dataframe(rows, use_container_width=True)
+    st.caption(
+        f"Rows {offset + 1 if len(rows) else 0}-{offset + len(rows)} of {total}, page {page} of {pages}"
+    )
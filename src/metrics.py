@@ -0,0 +1,201 @@
+"""Process-wide timing spans and counters.
+
+Every series is identified by a name and its labels (by convention ``domain``
+and ``operation``)::
+
+    with span("semantha_request", domain=domain, operation="references.search"):
+        ...
+    count("cache_lookups", domain=domain, operation="rank", result="hit")
+
+``prometheus()`` renders all series in the Prometheus text format; set the
+environment variable ``PLAYGROUND_METRICS_PORT`` to serve it under ``/metrics``.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Timings:
+    def __init__(self, window: int):
+        self.durations = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+
+
+class Metrics:
+    """Thread-safe registry of spans and counters.
+
+    Spans keep their count, error count and total duration, and the last
+    ``window`` durations from which the quantiles are computed.
+    """
+
+    def __init__(self, window=1024):
+        self.__window = window
+        self.__timings = {}
+        self.__counters = {}
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, failed, **labels)
+
+    def observe(self, name: str, seconds: float, failed=False, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            timings = self.__timings.get(key)
+            if timings is None:
+                timings = self.__timings[key] = _Timings(self.__window)
+            timings.durations.append(seconds)
+            timings.count += 1
+            timings.errors += failed
+            timings.sum += seconds
+
+    def count(self, name: str, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def spans(self) -> list[dict]:
+        """One row per span series with its count, errors and quantiles."""
+        with self.__lock:
+            snapshot = [
+                (name, labels, t.count, t.errors, t.sum, np.array(t.durations))
+                for (name, labels), t in self.__timings.items()
+            ]
+        rows = []
+        for name, labels, count, errors, total, durations in sorted(snapshot):
+            quantiles = np.quantile(durations, QUANTILES) if len(durations) else []
+            rows.append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": count,
+                    "errors": errors,
+                    "sum": total,
+                    **{f"p{int(q * 100)}": v for q, v in zip(QUANTILES, quantiles)},
+                }
+            )
+        return rows
+
+    def counters(self) -> list[dict]:
+        with self.__lock:
+            snapshot = sorted(self.__counters.items())
+        return [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in snapshot
+        ]
+
+    def prometheus(self) -> str:
+        # samples are grouped per metric family, as the text format requires
+        families = {}
+
+        def add(family, type_, sample):
+            families.setdefault(family, [f"# TYPE {family} {type_}"]).append(sample)
+
+        for row in self.spans():
+            name, labels = f"{row['name']}_seconds", row["labels"]
+            for q in QUANTILES:
+                if f"p{int(q * 100)}" in row:
+                    value = row[f"p{int(q * 100)}"]
+                    add(
+                        name,
+                        "summary",
+                        f"{name}{_labels(labels, quantile=q)} {value:.6f}",
+                    )
+            add(name, "summary", f"{name}_sum{_labels(labels)} {row['sum']:.6f}")
+            add(name, "summary", f"{name}_count{_labels(labels)} {row['count']}")
+            errors = f"{row['name']}_errors_total"
+            add(errors, "counter", f"{errors}{_labels(labels)} {row['errors']}")
+        for row in self.counters():
+            name = f"{row['name']}_total"
+            add(name, "counter", f"{name}{_labels(row['labels'])} {row['value']}")
+        return "".join(line + "\n" for lines in families.values() for line in lines)
+
+    def reset(self):
+        with self.__lock:
+            self.__timings.clear()
+            self.__counters.clear()
+
+
+def _labels(labels: dict, **extra) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for v in labels.values()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+METRICS = Metrics()
+
+
+def span(name: str, **labels):
+    return METRICS.span(name, **labels)
+
+
+def observe(name: str, seconds: float, failed=False, **labels):
+    METRICS.observe(name, seconds, failed, **labels)
+
+
+def count(name: str, value=1, **labels):
+    METRICS.count(name, value, **labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        data = METRICS.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+_SERVER = None
+_SERVER_LOCK = threading.Lock()
+
+
+def serve_metrics(port: int = None):
+    """Serve ``/metrics`` once per process if a port is given or configured."""
+    global _SERVER
+    port = port or int(os.environ.get("PLAYGROUND_METRICS_PORT", 0))
+    if not port:
+        return
+    with _SERVER_LOCK:
+        if _SERVER is not None:
+            return
+        try:
+            _SERVER = ThreadingHTTPServer(("", port), _MetricsHandler)
+        except OSError as e:
+            logging.warning(f"Cannot serve metrics on port {port}: {e}")
+            return
+        _SERVER.daemon_threads = True
+        threading.Thread(
+            target=_SERVER.serve_forever, name="metrics", daemon=True
+        ).start()
+        logging.info(f"Serving metrics on port {port}")
@@ -0,0 +1,146 @@
+import inspect
+import json
+import logging
+import re
+import threading
+from typing import Iterator, Protocol
+
+import numpy as np
+import requests
+
+from cluster.embedders import HashingEmbedder
+from rag.retrieval import Context
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_NOTHING_FOUND = "I could not find anything about that in the library."
+_PROMPT = (
+    "Answer the question based solely on the numbered passages below and cite "
+    "them like [1]. If they do not contain the answer, say so.\n\n"
+    "Passages:\n{context}\n\nQuestion: {question}"
+)
+
+
+class Generator(Protocol):
+    """Writes the answer to a question from a context, chunk by chunk."""
+
+    def stream(self, question: str, context: Context) -> Iterator[str]:
+        ...
+
+
+class ExtractiveGenerator:
+    """Local stand-in for a language model.
+
+    Answers with the ``max_sentences`` sentences of the context that are most
+    similar to the question (bag-of-words cosine), each cited with the number
+    of its passage, and streams them word by word. Needs no model or network,
+    so the RAG flow can be run and tested anywhere.
+    """
+
+    def __init__(self, max_sentences=3, min_similarity=0.05):
+        self.__max_sentences = max_sentences
+        self.__min_similarity = min_similarity
+        self.__embedder = HashingEmbedder()
+
+    def stream(self, question: str, context: Context) -> Iterator[str]:
+        sentences = [
+            (number, sentence)
+            for number, passage in enumerate(context.passages, 1)
+            for sentence in _SENTENCE.split(passage.text.replace("\n", " "))
+            if sentence.strip()
+        ]
+        if not sentences:
+            yield _NOTHING_FOUND
+            return
+        embeddings = self.__embedder.embed([question] + [s for _, s in sentences])
+        similarities = embeddings[1:] @ embeddings[0]
+        best = np.argsort(-similarities, kind="stable")[: self.__max_sentences]
+        best = sorted(i for i in best if similarities[i] >= self.__min_similarity)
+        if not best:
+            yield _NOTHING_FOUND
+            return
+        for i in best:
+            number, sentence = sentences[i]
+            for word in sentence.split():
+                yield word + " "
+            yield f"[{number}] "
+
+
+class ChatCompletionsGenerator:
+    """Streams the answer of a model behind an OpenAI compatible chat API.
+
+    Posts the question and the numbered passages to ``{url}/chat/completions``
+    with ``stream`` enabled and yields the content deltas of the server-sent
+    events as they arrive.
+    """
+
+    def __init__(self, url: str, model: str, api_key: str = None, timeout=60.0):
+        self.__url = url.rstrip("/") + "/chat/completions"
+        self.__model = model
+        self.__headers = {} if not api_key else {"Authorization": f"Bearer {api_key}"}
+        self.__timeout = float(timeout)
+        self.__session = requests.Session()
+
+    def stream(self, question: str, context: Context) -> Iterator[str]:
+        prompt = _PROMPT.format(context=context.text, question=question)
+        with self.__session.post(
+            self.__url,
+            json={
+                "model": self.__model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": True,
+            },
+            headers=self.__headers,
+            timeout=self.__timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            # no chunk size, so that every event is handed on as it arrives
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+GENERATORS = {
+    "extractive": ExtractiveGenerator,
+    "chat_completions": ChatCompletionsGenerator,
+}
+
+
+_INSTANCES = {}
+_INSTANCES_LOCK = threading.Lock()
+
+
+def get_generator(backend: str, **settings) -> Generator:
+    """Return the shared generator registered as ``backend`` with its settings.
+
+    The settings may hold those of other backends as well (the config and the
+    secrets can prepare several); only the ones ``backend`` takes are passed.
+    """
+    if backend not in GENERATORS:
+        raise ValueError(f"Unknown generator backend '{backend}'")
+    parameters = inspect.signature(GENERATORS[backend]).parameters
+    ignored = sorted(set(settings) - set(parameters))
+    if ignored:
+        logging.debug(f"Generator {backend} ignores the settings {ignored}")
+    settings = {k: v for k, v in settings.items() if k in parameters}
+    missing = [
+        name
+        for name, parameter in parameters.items()
+        if parameter.default is inspect.Parameter.empty and name not in settings
+    ]
+    if missing:
+        raise ValueError(
+            f"Generator backend '{backend}' needs the settings {', '.join(missing)}"
+        )
+    key = (backend, tuple(sorted(settings.items())))
+    with _INSTANCES_LOCK:
+        if key not in _INSTANCES:
+            _INSTANCES[key] = GENERATORS[backend](**settings)
+        return _INSTANCES[key]
@@ -0,0 +1,245 @@
+import re
+import threading
+from collections import deque
+from typing import Sequence
+
+import numpy as np
+
+from cluster.embedders import Embedder, HashingEmbedder
+from metrics import count, span
+from semantha.cache import LRUCache
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SPACE = re.compile(r"\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Words and punctuation marks, a cheap estimate of a model's tokens."""
+    return len(_TOKEN.findall(text))
+
+
+class Passage:
+    """A piece of a retrieved document that goes into the context as a whole."""
+
+    def __init__(self, doc_id: str, name: str, text: str, similarity: float):
+        self.doc_id = doc_id
+        self.name = name
+        self.text = text
+        self.similarity = similarity
+        self.tokens = count_tokens(text)
+
+
+class Context:
+    """The passages that fit into the token budget, most similar first.
+
+    ``text`` numbers the passages (``[1] ...``) so that answers can cite them.
+    """
+
+    def __init__(self, passages: list[Passage]):
+        self.passages = passages
+        self.tokens = sum(p.tokens for p in passages)
+        self.text = "\n\n".join(f"[{i}] {p.text}" for i, p in enumerate(passages, 1))
+
+
+def split_passages(
+    doc_id: str, name: str, content: str, similarity: float, max_tokens: int
+) -> list[Passage]:
+    """Cut a document at paragraph breaks into passages of at most ``max_tokens``.
+
+    Paragraphs are joined while they fit; a single paragraph that is longer
+    than ``max_tokens`` becomes a passage of its own.
+    """
+    passages, current, tokens = [], [], 0
+    for paragraph in (p.strip() for p in content.split("\n")):
+        if not paragraph:
+            continue
+        paragraph_tokens = count_tokens(paragraph)
+        if current and tokens + paragraph_tokens > max_tokens:
+            passages.append(Passage(doc_id, name, "\n".join(current), similarity))
+            current, tokens = [], 0
+        current.append(paragraph)
+        tokens += paragraph_tokens
+    if current:
+        passages.append(Passage(doc_id, name, "\n".join(current), similarity))
+    return passages
+
+
+def dedupe(passages: Sequence[Passage]) -> list[Passage]:
+    """Drop passages whose text (ignoring case and whitespace) was seen before."""
+    seen = set()
+    unique = []
+    for passage in passages:
+        key = _SPACE.sub(" ", passage.text).strip().lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(passage)
+    return unique
+
+
+def pack(
+    passages: Sequence[Passage], token_budget: int, relevance: Sequence[float] = None
+) -> Context:
+    """The most similar passages that fit into ``token_budget`` tokens.
+
+    ``relevance`` ranks the passages instead of their similarity, one score per
+    passage.
+    """
+    if relevance is None:
+        relevance = [p.similarity for p in passages]
+    ranked = sorted(range(len(passages)), key=lambda i: relevance[i], reverse=True)
+    packed, tokens = [], 0
+    for passage in (passages[i] for i in ranked):
+        if tokens + passage.tokens <= token_budget:
+            packed.append(passage)
+            tokens += passage.tokens
+    return Context(packed)
+
+
+class Conversation:
+    """The recent questions of one conversation, for the topic reuse of a
+    ``Retriever``.
+
+    Kept in the session, so that the passages retrieved for one visitor's
+    question are never reused for another visitor's.
+    """
+
+    def __init__(self, recent=8):
+        self.__questions = deque(maxlen=recent)
+
+    def add(self, key: str, embedding: np.ndarray):
+        if all(key != k for k, _ in self.__questions):
+            self.__questions.append((key, embedding))
+
+    def similar(self, embedding: np.ndarray) -> list[tuple[float, str]]:
+        """``(similarity, key)`` of the questions, most similar first."""
+        return sorted(
+            ((float(e @ embedding), key) for key, e in self.__questions),
+            reverse=True,
+        )
+
+
+class Retriever:
+    """Retrieves the context for questions on one semantha® domain.
+
+    The hits of ``SemanthaConnector.query_library`` are split into passages,
+    deduplicated and packed into at most ``token_budget`` tokens. Passages and
+    contexts are cached per question. Within a ``Conversation``, a follow-up
+    question whose embedding is at least ``topic_similarity`` similar to an
+    earlier question reuses that question's passages without another search;
+    they are ranked by their similarity to the follow-up before packing. Both
+    similarities come from the local ``embedder`` (by default the lexical
+    ``HashingEmbedder``), not from semantha®.
+    """
+
+    def __init__(
+        self,
+        connector,
+        domain: str,
+        tags=None,
+        threshold=0.3,
+        max_references=10,
+        passage_tokens=200,
+        token_budget=1500,
+        topic_similarity=0.8,
+        cache_entries=256,
+        embedder: Embedder = None,
+    ):
+        self.__connector = connector
+        self.__domain = domain
+        self.__tags = tags
+        self.__threshold = threshold
+        self.__max_references = max_references
+        self.__passage_tokens = passage_tokens
+        self.__token_budget = token_budget
+        self.__topic_similarity = topic_similarity
+        self.__embedder = embedder if embedder is not None else HashingEmbedder()
+        self.__passages = LRUCache(max_entries=cache_entries)
+        self.__contexts = LRUCache(max_entries=cache_entries)
+
+    def context(
+        self, question: str, token_budget: int = None, conversation=None
+    ) -> Context:
+        token_budget = token_budget or self.__token_budget
+        key = _SPACE.sub(" ", question).strip().lower()
+        embedding = self.__embedder.embed([question])[0]
+        passages = self.__reusable(key, embedding, conversation)
+        if passages is not None:
+            count(
+                "rag_context_lookups",
+                domain=self.__domain,
+                operation="topic",
+                result="hit",
+            )
+            texts = self.__embedder.embed([p.text for p in passages])
+            return pack(passages, token_budget, texts @ embedding)
+        context = self.__contexts.get((key, token_budget))
+        count(
+            "rag_context_lookups",
+            domain=self.__domain,
+            operation="context",
+            result="miss" if context is None else "hit",
+        )
+        if context is None:
+            context = pack(self.__retrieve(key, question), token_budget)
+            self.__contexts.put((key, token_budget), context)
+        if conversation is not None:
+            conversation.add(key, embedding)
+        return context
+
+    def __reusable(self, key: str, embedding: np.ndarray, conversation):
+        """The passages of an earlier question of the conversation on the same
+        topic, if the question itself was not retrieved yet."""
+        if conversation is None or self.__passages.get_stale(key) is not None:
+            return None
+        for similarity, earlier in conversation.similar(embedding):
+            if similarity < self.__topic_similarity:
+                break
+            passages = self.__passages.get_stale(earlier)
+            if passages is not None:
+                return passages
+        return None
+
+    def __retrieve(self, key: str, question: str) -> list[Passage]:
+        passages = self.__passages.get(key)
+        count(
+            "rag_context_lookups",
+            domain=self.__domain,
+            operation="passages",
+            result="miss" if passages is None else "hit",
+        )
+        if passages is None:
+            with span("rag", domain=self.__domain, operation="retrieve"):
+                hits = self.__connector.query_library(
+                    question,
+                    self.__domain,
+                    threshold=self.__threshold,
+                    max_references=self.__max_references,
+                    tags=self.__tags,
+                )
+            passages = dedupe(
+                passage
+                for doc_id, hit in hits.items()
+                for passage in split_passages(
+                    doc_id,
+                    hit["doc_name"],
+                    hit["content"],
+                    hit["similarity"],
+                    self.__passage_tokens,
+                )
+            )
+            self.__passages.put(key, passages)
+        return passages
+
+
+_RETRIEVERS = {}
+_RETRIEVERS_LOCK = threading.Lock()
+
+
+def get_retriever(connector, domain: str, tags=None, **settings) -> Retriever:
+    """Return the process-wide retriever of a domain, tag filter and settings."""
+    key = (id(connector), domain, None if tags is None else tuple(tags))
+    key += tuple(sorted(settings.items()))
+    with _RETRIEVERS_LOCK:
+        if key not in _RETRIEVERS:
+            _RETRIEVERS[key] = Retriever(connector, domain, tags, **settings)
+        return _RETRIEVERS[key]
@@ -1,11 +1,36 @@
+import csv
 import io
 import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Iterable, Iterator, TextIO
 
-import semantha_sdk
 from semantha_sdk.model.document import Document
 from semantha_sdk.model.settings import Settings
 
-import streamlit as st
+from metrics import count, span
+from semantha.cache import LRUCache
+from semantha.domain_models import DomainModels
+from semantha.resilience import AdaptiveLimiter, BackendUnavailableError, CircuitBreaker
+from semantha.rest_client import login
+from semantha.single_flight import SingleFlight
+
+_CONNECTORS = {}
+_CONNECTORS_LOCK = threading.Lock()
+
+
+def get_connector(server_base_url: str, api_key: str) -> "SemanthaConnector":
+    """Return the process-wide connector for the given server and API key.
+
+    The connector (and its pooled HTTP session) is created and logged in only
+    once; all Streamlit sessions and pages share it.
+    """
+    key = (server_base_url, api_key)
+    with _CONNECTORS_LOCK:
+        if key not in _CONNECTORS:
+            logging.info(f"Creating shared semantha connector for {server_base_url}")
+            _CONNECTORS[key] = SemanthaConnector(server_base_url, api_key)
+        return _CONNECTORS[key]
 
 
 def _to_text_file(text: str):
@@ -14,76 +39,325 @@ def _to_text_file(text: str):
     return input_file
 
 
+def _document_record(doc: Document) -> dict:
+    return {"doc_name": doc.name, "content": _document_content(doc)}
+
+
+def _record_size(record: dict) -> int:
+    return len(record["doc_name"] or "") + len(record["content"])
+
+
+def _document_content(doc: Document) -> str:
+    content = ""
+    for p in doc.pages:
+        for c in p.contents:
+            if c.paragraphs is not None:
+                content += "\n".join([par.text for par in c.paragraphs])
+    return content
+
+
 class SemanthaConnector:
     def __init__(
         self,
         server_base_url="http://localhost/tt-platform-server",
         api_key=None,
+        max_workers=8,
+        document_cache_size=64 * 1024 * 1024,
+        document_ttl=60 * 60,
+        result_cache_entries=4096,
+        result_ttl=10 * 60,
+        timeout=(3.05, 60),
+        retries=2,
+        failure_threshold=5,
+        reset_timeout=30.0,
     ):
-        self.__sdk = semantha_sdk.login(server_url=server_base_url, key=api_key)
+        self.__breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.__limiter = AdaptiveLimiter(initial=max_workers, max_limit=max_workers * 2)
+        self.__sdk = login(
+            server_base_url,
+            api_key,
+            pool_size=max_workers * 2,
+            timeout=timeout,
+            retries=retries,
+            breaker=self.__breaker,
+            limiter=self.__limiter,
+        )
+        self.__max_workers = max_workers
+        self.__executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="semantha-connector"
+        )
+        # documents are keyed by (domain, document id) and bounded by the number
+        # of characters they hold; rankings, library pages and compare results
+        # only keep ids and scores, so an entry count is enough to bound them
+        self.__documents = LRUCache(
+            max_size=document_cache_size, ttl=document_ttl, size_of=_record_size
+        )
+        self.__rankings = LRUCache(max_entries=result_cache_entries, ttl=result_ttl)
+        self.__library_pages = LRUCache(
+            max_entries=result_cache_entries, ttl=result_ttl
+        )
+        self.__comparisons = LRUCache(max_entries=result_cache_entries)
+        self.__domain_models = DomainModels(self.__read_model, self.__write_model)
+        # identical requests of concurrent sessions share one backend call
+        self.__flights = SingleFlight()
 
-    @st.cache_data(show_spinner=False, persist="disk")
     def query_library(
-        __self, text: str, domain: str, threshold=0.75, max_references=10, tags=None
+        self, text: str, domain: str, threshold=0.75, max_references=10, tags=None
     ):
-        logging.info(f"Executing library search. Query string: '{text}'")
-        doc = __self.__sdk.domains(domain).references.post(
-            file=_to_text_file(text),
-            similaritythreshold=threshold,
-            maxreferences=max_references,
-            tags=None if tags is None else ",".join(tags),
-        )
+        ranked = self.__rank(text, domain, threshold, max_references, tags)
+        ref_docs = self.__get_documents([doc_id for doc_id, _ in ranked], domain)
         result_dict = {}
-        if doc.references:
-            for ref in doc.references:
-                result_dict[ref.document_id] = {
-                    "doc_name": __self.__get_ref_doc_name(ref.document_id, domain),
-                    "content": __self.__get_document_content(ref.document_id, domain),
-                    "similarity": ref.similarity,
-                }
+        for doc_id, similarity in ranked:
+            result_dict[doc_id] = {**ref_docs[doc_id], "similarity": similarity}
         return result_dict
 
-    @st.cache_data(show_spinner=False, persist="disk")
-    def get_library(__self, domain: str, tags=None, **kwargs):
+    def stream_query_library(
+        self, text: str, domain: str, threshold=0.75, max_references=10, tags=None
+    ) -> tuple[list[tuple[str, float]], Iterator[tuple[int, dict]]]:
+        """Search the library and resolve the hits' documents in the background.
+
+        Returns as soon as the search itself has returned: the ranked
+        ``(doc_id, similarity)`` hits, and an iterator that yields
+        ``(rank, record)`` with the ``doc_name`` and ``content`` of the hit at
+        ``rank`` in the order in which the documents arrive.
+        """
+        ranked = self.__rank(text, domain, threshold, max_references, tags)
+        # the ids of a ranking are unique
+        futures = {
+            self.__executor.submit(self.__get_document, doc_id, domain): rank
+            for rank, (doc_id, _) in enumerate(ranked)
+        }
+
+        def records():
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+        return ranked, records()
+
+    def get_library(self, domain: str, tags=None, **kwargs):
         limit = kwargs.get("limit", None)
         logging.info(f"Fetching library documents with limit: {limit}")
-        if limit is None:
-            offset = None
-        else:
-            offset = kwargs.get("offset", 0)
-        ref_doc_coll = __self.__sdk.domains(domain).referencedocuments.get(
-            tags=None if tags is None else ",".join(tags), offset=offset, limit=limit
+        return list(
+            self.iter_library(
+                domain, tags=tags, offset=kwargs.get("offset", 0), limit=limit
+            )
+        )
+
+    def iter_library(
+        self, domain: str, tags=None, offset=0, limit=None, page_size=100, sort=None
+    ) -> Iterator[dict]:
+        """Walk the library page by page and yield one record per document.
+
+        While the contents of the current page are resolved on the pool, the
+        next page is already being requested, so only about two pages are ever
+        held in memory. ``sort`` is passed to the server, e.g. ``"name"`` or
+        ``"-name"``.
+        """
+        logging.info(
+            f"Streaming library '{domain}' from offset {offset} with limit: {limit}"
         )
-        library = []
-        for d in ref_doc_coll.data:
-            library.append(
-                {
-                    "doc_name": d.name,
-                    "content": __self.__get_document_content(d.id, domain),
-                }
+        end = None if limit is None else offset + limit
+        page = []
+        if end is None or offset < end:
+            page = self.__get_library_page(domain, tags, offset, page_size, end, sort)
+        while page:
+            offset += len(page)
+            next_page = None
+            if len(page) == page_size and (end is None or offset < end):
+                next_page = self.__executor.submit(
+                    self.__get_library_page,
+                    domain,
+                    tags,
+                    offset,
+                    page_size,
+                    end,
+                    sort,
+                )
+            records = self.__executor.map(
+                lambda doc_id: self.__get_document(doc_id, domain),
+                [doc_id for doc_id, _ in page],
             )
-        return library
+            for (_, name), record in zip(page, records):
+                yield {"doc_name": name, "content": record["content"]}
+            page = [] if next_page is None else next_page.result()
+
+    def library_size(self, domain: str, tags=None) -> int:
+        """Number of documents in the library (with one of the ``tags``)."""
+        return self.__cached(
+            self.__library_pages,
+            "library_size",
+            (domain, None if tags is None else tuple(tags)),
+            lambda: self.__fetch_library_size(domain, tags),
+        )
+
+    def get_document(self, doc_id: str, domain: str) -> dict:
+        """Name and content of one reference document (cached)."""
+        return self.__get_document(doc_id, domain)
+
+    def export_library(self, domain: str, file: TextIO, tags=None, page_size=100):
+        """Write the complete library as CSV (Name, Content) to ``file``."""
+        writer = csv.writer(file)
+        writer.writerow(["Name", "Content"])
+        exported = 0
+        for record in self.iter_library(domain, tags=tags, page_size=page_size):
+            writer.writerow([record["doc_name"], record["content"]])
+            exported += 1
+        return exported
 
-    @st.cache_data(show_spinner=False, persist="disk")
     def do_semantic_string_compare(
-        __self,
+        self,
         input_0: str,
         input_1: str,
         domain: str,
         model_id: int,
         with_opposite_meaning=False,
     ) -> tuple[bool, float]:
+        return self.__cached(
+            self.__comparisons,
+            "compare",
+            (domain, model_id, input_0, input_1, with_opposite_meaning),
+            lambda: self.__compare(
+                input_0, input_1, domain, model_id, with_opposite_meaning
+            ),
+        )
+
+    def iter_compare_batch(
+        self,
+        pairs: Iterable[tuple],
+        domain: str,
+        model_id: int,
+        with_opposite_meaning=False,
+        max_concurrency=None,
+    ) -> Iterator[tuple[int, bool, float, str]]:
+        """Compare many text pairs and yield results as they complete.
+
+        Each pair is ``(input_0, input_1)`` or ``(input_0, input_1, omd)`` where
+        ``omd`` overrides ``with_opposite_meaning`` for that pair. Yields
+        ``(index, opposite_meaning, similarity, error)`` in completion order; a
+        failed pair yields ``None`` scores and the error message instead of
+        aborting the batch. At most ``max_concurrency`` pairs are in flight.
+
+        The pairs run on a pool of the batch's own, so a large batch does not
+        hold up the calls of other sessions on the connector's pool.
+        """
+        max_concurrency = max_concurrency or self.__max_workers
+        pending = {}
+        with ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="semantha-batch"
+        ) as pool:
+            for index, pair in enumerate(pairs):
+                if len(pending) >= max_concurrency:
+                    yield from self.__collect_compares(pending, FIRST_COMPLETED)
+                omd = pair[2] if len(pair) > 2 else with_opposite_meaning
+                future = pool.submit(
+                    self.do_semantic_string_compare,
+                    pair[0],
+                    pair[1],
+                    domain,
+                    model_id,
+                    bool(omd),
+                )
+                pending[future] = index
+            while pending:
+                yield from self.__collect_compares(pending, FIRST_COMPLETED)
+
+    def compare_batch(
+        self,
+        pairs: list[tuple],
+        domain: str,
+        model_id: int,
+        with_opposite_meaning=False,
+        max_concurrency=None,
+        progress: Callable[[int, int], None] = None,
+    ) -> list[tuple[bool, float, str]]:
+        """Like ``iter_compare_batch`` but returns the results in pair order.
+
+        ``progress(done, total)`` is called after every completed pair.
+        """
+        results = [None] * len(pairs)
+        for done, (index, omd, similarity, error) in enumerate(
+            self.iter_compare_batch(
+                pairs, domain, model_id, with_opposite_meaning, max_concurrency
+            ),
+            start=1,
+        ):
+            results[index] = (omd, similarity, error)
+            if progress is not None:
+                progress(done, len(pairs))
+        return results
+
+    def change_model(self, domain: str, model_id: int) -> int:
+        """Explicitly set the model of a domain.
+
+        Compares select their model themselves, so this is only needed when the
+        domain is used outside of ``do_semantic_string_compare``.
+        """
+        model_id = self.__write_model(domain, model_id)
+        self.__domain_models.set(domain, model_id)
+        return model_id
+
+    def active_models(self) -> dict[str, int]:
+        return self.__domain_models.active()
+
+    def cache_stats(self) -> dict[str, dict]:
+        return {
+            "documents": self.__documents.stats(),
+            "rankings": self.__rankings.stats(),
+            "library_pages": self.__library_pages.stats(),
+            "comparisons": self.__comparisons.stats(),
+            "model_switches": {"switches": self.__domain_models.switches},
+            "single_flight": self.__flights.stats(),
+            "circuit_breaker": self.__breaker.stats(),
+            "concurrency_limit": self.__limiter.stats(),
+        }
+
+    def __rank(self, text, domain, threshold, max_references, tags):
+        return self.__cached(
+            self.__rankings,
+            "rank",
+            (
+                domain,
+                text,
+                threshold,
+                max_references,
+                None if tags is None else tuple(tags),
+            ),
+            lambda: self.__search(text, domain, threshold, max_references, tags),
+        )
+
+    def __search(self, text, domain, threshold, max_references, tags):
+        logging.info(f"Executing library search. Query string: '{text}'")
+        with span("semantha_request", domain=domain, operation="references.search"):
+            doc = self.__sdk.domains(domain).references.post(
+                file=_to_text_file(text),
+                similaritythreshold=threshold,
+                maxreferences=max_references,
+                tags=None if tags is None else ",".join(tags),
+            )
+        hits = {}
+        for ref in doc.references or []:
+            if ref.document_id not in hits or ref.similarity > hits[ref.document_id]:
+                hits[ref.document_id] = ref.similarity
+        return sorted(hits.items(), key=lambda hit: hit[1], reverse=True)
+
+    def __compare(self, input_0, input_1, domain, model_id, with_opposite_meaning):
+        with self.__domain_models.use(domain, model_id):
+            return self.__do_compare(
+                input_0, input_1, domain, model_id, with_opposite_meaning
+            )
+
+    def __do_compare(self, input_0, input_1, domain, model_id, with_opposite_meaning):
         logging.info("Executing string compare...")
         logging.info(f"Text A: {input_0}")
         logging.info(f"Text B: {input_1}")
         logging.info(f"Using model with ID '{model_id}'")
         if with_opposite_meaning:
             logging.info("Also checking for opposite meaning")
-            doc = __self.__get_references(
+            doc = self.__get_references(
                 input_0, input_1, domain, "23d06b42-4a32-4531-b00e-640f538e2aee"
             )
         else:
-            doc = __self.__get_references(input_0, input_1, domain)
+            doc = self.__get_references(input_0, input_1, domain)
         if doc.references:
             if with_opposite_meaning:
                 return (
@@ -98,34 +372,144 @@ class SemanthaConnector:
                 return False, doc.references[0].similarity
         return False, 0.0
 
-    def change_model(__self, domain: str, model_id: int) -> int:
+    def __read_model(self, domain: str):
+        with span("semantha_request", domain=domain, operation="settings.get"):
+            model_id = self.__sdk.domains(domain).settings.get().similarity_model_id
+        return None if model_id is None else int(model_id)
+
+    def __write_model(self, domain: str, model_id: int) -> int:
         logging.info(f"Changing model for domain {domain} to {model_id}")
-        return int(
-            __self.__sdk.domains(domain)
-            .settings.patch(Settings(similarity_model_id=str(model_id)))
-            .similarity_model_id
-        )
+        with span("semantha_request", domain=domain, operation="settings.patch"):
+            return int(
+                self.__sdk.domains(domain)
+                .settings.patch(Settings(similarity_model_id=str(model_id)))
+                .similarity_model_id
+            )
+
+    @staticmethod
+    def __collect_compares(pending: dict, return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                omd, similarity = future.result()
+                yield index, omd, similarity, None
+            except Exception as e:
+                logging.warning(f"Compare of pair {index} failed: {e}")
+                yield index, None, None, str(e)
 
     def __get_references(self, input_0, input_1, domain, doc_type=None):
-        return self.__sdk.domains(domain).references.post(
-            file=_to_text_file(input_0),
-            referencedocument=_to_text_file(input_1),
-            similaritythreshold=0.01,
-            maxreferences=1,
-            documenttype=doc_type,
+        with span("semantha_request", domain=domain, operation="references.compare"):
+            return self.__sdk.domains(domain).references.post(
+                file=_to_text_file(input_0),
+                referencedocument=_to_text_file(input_1),
+                similaritythreshold=0.01,
+                maxreferences=1,
+                documenttype=doc_type,
+            )
+
+    def __get_library_page(self, domain, tags, offset, page_size, end, sort=None):
+        limit = page_size if end is None else min(page_size, end - offset)
+        return self.__cached(
+            self.__library_pages,
+            "library",
+            (domain, None if tags is None else tuple(tags), offset, limit, sort),
+            lambda: self.__fetch_library_page(domain, tags, offset, limit, sort),
+        )
+
+    def __fetch_library_page(self, domain, tags, offset, limit, sort):
+        with span(
+            "semantha_request", domain=domain, operation="referencedocuments.list"
+        ):
+            ref_doc_coll = self.__sdk.domains(domain).referencedocuments.get(
+                tags=None if tags is None else ",".join(tags),
+                offset=offset,
+                limit=limit,
+                sort=sort,
+            )
+        return [(d.id, d.name) for d in ref_doc_coll.data or []]
+
+    def __fetch_library_size(self, domain, tags):
+        with span(
+            "semantha_request", domain=domain, operation="referencedocuments.list"
+        ):
+            ref_doc_coll = self.__sdk.domains(domain).referencedocuments.get(
+                tags=None if tags is None else ",".join(tags),
+                offset=0,
+                limit=1,
+                fields="id",
+            )
+        page = ref_doc_coll.meta.page if ref_doc_coll.meta is not None else None
+        if page is not None and page.total is not None:
+            return page.total
+        logging.warning(f"No library size reported for '{domain}', counting pages")
+        return self.__count_library(domain, tags)
+
+    def __count_library(self, domain, tags, page_size=1000):
+        count = 0
+        while True:
+            with span(
+                "semantha_request", domain=domain, operation="referencedocuments.list"
+            ):
+                ref_doc_coll = self.__sdk.domains(domain).referencedocuments.get(
+                    tags=None if tags is None else ",".join(tags),
+                    offset=count,
+                    limit=page_size,
+                    fields="id",
+                )
+            found = len(ref_doc_coll.data or [])
+            count += found
+            if found < page_size:
+                return count
+
+    def __get_documents(self, doc_ids: list[str], domain: str) -> dict[str, dict]:
+        # every id is fetched at most once, concurrently on the bounded pool
+        unique_ids = list(dict.fromkeys(doc_ids))
+        records = self.__executor.map(
+            lambda doc_id: self.__get_document(doc_id, domain), unique_ids
+        )
+        return dict(zip(unique_ids, records))
+
+    def __get_document(self, doc_id: str, domain: str) -> dict:
+        return self.__cached(
+            self.__documents,
+            "document",
+            (domain, doc_id),
+            lambda: _document_record(self.__get_ref_doc(doc_id, domain)),
+        )
+
+    def __cached(self, cache: LRUCache, operation: str, key: tuple, fetch):
+        """Serve ``key`` from ``cache`` or fetch it once for all waiting callers.
+
+        If semantha® cannot be reached, an expired entry is served instead.
+        """
+        value = cache.get(key)
+        # the domain leads every cache key
+        count(
+            "semantha_cache_lookups",
+            domain=key[0],
+            operation=operation,
+            result="miss" if value is None else "hit",
         )
+        if value is None:
 
-    def __get_document_content(self, doc_id: str, domain: str) -> str:
-        doc = self.__get_ref_doc(doc_id, domain)
-        content = ""
-        for p in doc.pages:
-            for c in p.contents:
-                if c.paragraphs is not None:
-                    content += "\n".join([par.text for par in c.paragraphs])
-        return content
+            def load():
+                loaded = fetch()
+                cache.put(key, loaded)
+                return loaded
 
-    def __get_ref_doc_name(self, doc_id: str, domain: str) -> str:
-        return self.__get_ref_doc(doc_id, domain).name
+            try:
+                value = self.__flights.do((operation,) + key, load)
+            except BackendUnavailableError:
+                value = cache.get_stale(key)
+                if value is None:
+                    raise
+                logging.warning(f"semantha® unavailable, serving stale {operation}")
+                count("semantha_stale_served", domain=key[0], operation=operation)
+        return value
 
     def __get_ref_doc(self, doc_id: str, domain: str) -> Document:
-        return self.__sdk.domains(domain).referencedocuments(doc_id).get()
+        with span(
+            "semantha_request", domain=domain, operation="referencedocuments.get"
+        ):
+            return self.__sdk.domains(domain).referencedocuments(doc_id).get()
@@ -0,0 +1,125 @@
+import asyncio
+import weakref
+from typing import Awaitable, TypeVar
+
+from semantha.SemanthaConnector import SemanthaConnector, get_connector
+
+T = TypeVar("T")
+
+
+class AsyncSemanthaConnector:
+    """Coroutine API on top of a (shared) ``SemanthaConnector``.
+
+    Every call runs the blocking connector method in the event loop's default
+    executor, so several backend calls can be awaited together with
+    ``asyncio.gather``. At most ``max_concurrency`` calls per domain are in
+    flight at a time.
+    """
+
+    def __init__(self, connector: SemanthaConnector, max_concurrency=4):
+        self.__connector = connector
+        self.__max_concurrency = max_concurrency
+        # asyncio semaphores belong to one event loop
+        self.__semaphores = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def login(cls, server_base_url: str, api_key: str, max_concurrency=4):
+        return cls(get_connector(server_base_url, api_key), max_concurrency)
+
+    async def query_library(
+        self, text: str, domain: str, threshold=0.75, max_references=10, tags=None
+    ) -> dict:
+        return await self.__call(
+            domain,
+            self.__connector.query_library,
+            text,
+            domain,
+            threshold,
+            max_references,
+            tags,
+        )
+
+    async def get_library(self, domain: str, tags=None, offset=0, limit=None):
+        return await self.__call(
+            domain,
+            lambda: self.__connector.get_library(
+                domain, tags=tags, offset=offset, limit=limit
+            ),
+        )
+
+    async def get_document(self, doc_id: str, domain: str) -> dict:
+        return await self.__call(domain, self.__connector.get_document, doc_id, domain)
+
+    async def get_documents(self, doc_ids: list[str], domain: str) -> list[dict]:
+        return await asyncio.gather(
+            *[self.get_document(doc_id, domain) for doc_id in doc_ids]
+        )
+
+    async def compare(
+        self,
+        input_0: str,
+        input_1: str,
+        domain: str,
+        model_id: int,
+        with_opposite_meaning=False,
+    ) -> tuple[bool, float]:
+        return await self.__call(
+            domain,
+            self.__connector.do_semantic_string_compare,
+            input_0,
+            input_1,
+            domain,
+            model_id,
+            with_opposite_meaning,
+        )
+
+    def __semaphore(self, domain: str) -> asyncio.Semaphore:
+        semaphores = self.__semaphores.setdefault(asyncio.get_running_loop(), {})
+        if domain not in semaphores:
+            semaphores[domain] = asyncio.Semaphore(self.__max_concurrency)
+        return semaphores[domain]
+
+    async def __call(self, domain, function, *args):
+        async with self.__semaphore(domain):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, function, *args
+            )
+
+
+def run_sync(awaitable: Awaitable[T]) -> T:
+    """Run a coroutine from synchronous code such as a Streamlit script."""
+    return asyncio.run(awaitable)
+
+
+def query_libraries(
+    connector: AsyncSemanthaConnector, queries: list[dict]
+) -> list[dict]:
+    """Run several library searches concurrently; ``queries`` holds the keyword
+    arguments of ``query_library`` for each search."""
+
+    async def gather():
+        return await asyncio.gather(
+            *[connector.query_library(**query) for query in queries]
+        )
+
+    return run_sync(gather())
+
+
+def compare_pairs(
+    connector: AsyncSemanthaConnector,
+    pairs: list[tuple],
+    domain: str,
+    model_id: int,
+    with_opposite_meaning=False,
+) -> list[tuple[bool, float]]:
+    """Compare several text pairs concurrently, results in pair order."""
+
+    async def gather():
+        return await asyncio.gather(
+            *[
+                connector.compare(a, b, domain, model_id, with_opposite_meaning)
+                for a, b in pairs
+            ]
+        )
+
+    return run_sync(gather())
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with optional size bound and TTL.
+
+    Entries are evicted least-recently-used first once either ``max_entries``
+    or ``max_size`` (the sum of ``size_of(value)`` over all entries) would be
+    exceeded. Entries older than ``ttl`` seconds count as misses, but are kept
+    until they are evicted or replaced so that ``get_stale`` can still serve
+    them, e.g. while the backend is unavailable.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        max_size: int = None,
+        ttl: float = None,
+        size_of: Callable[[Any], int] = None,
+    ):
+        self.__max_entries = max_entries
+        self.__max_size = max_size
+        self.__ttl = ttl
+        self.__size_of = size_of if size_of is not None else (lambda _: 1)
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key: Hashable, default=None):
+        """The value of ``key`` even if it has expired; not counted as hit or miss."""
+        with self.__lock:
+            entry = self.__entries.get(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def put(self, key: Hashable, value):
+        size = self.__size_of(value)
+        if self.__max_size is not None and size > self.__max_size:
+            return
+        expires_at = None if self.__ttl is None else time.monotonic() + self.__ttl
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (value, size, expires_at)
+            self.__size += size
+            while (
+                self.__max_entries is not None
+                and len(self.__entries) > self.__max_entries
+            ) or (self.__max_size is not None and self.__size > self.__max_size):
+                self.__remove(next(iter(self.__entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "entries": len(self.__entries),
+                "size": self.__size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __remove(self, key):
+        _, size, _ = self.__entries.pop(key)
+        self.__size -= size
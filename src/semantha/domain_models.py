@@ -0,0 +1,135 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+
+
+class _Domain:
+    def __init__(self):
+        self.active = None
+        self.known = False
+        self.in_flight = 0
+        self.switching = False
+        # the requests waiting for the domain, in arrival order
+        self.waiting = deque()
+
+
+class _Waiter:
+    def __init__(self, model_id: int):
+        self.model_id = model_id
+
+
+class DomainModels:
+    """Tracks the similarity model that is active on each domain of the process.
+
+    ``use(domain, model_id)`` only writes the domain settings when the domain is
+    not yet known to run ``model_id``. A domain that is shared by several models
+    is switched only once all requests running on the previous model have
+    finished, so concurrent sessions can never compare with the wrong model.
+    Domains that are pinned to a single model are written at most once.
+
+    Requests are served in arrival order per domain: once a request for another
+    model waits, later requests for the active model queue up behind it instead
+    of keeping the domain busy, so a large batch cannot starve a single compare.
+    The settings are read and written without holding the lock.
+    """
+
+    def __init__(
+        self,
+        read_model: Callable[[str], int],
+        write_model: Callable[[str, int], int],
+    ):
+        self.__read_model = read_model
+        self.__write_model = write_model
+        self.__domains = {}
+        self.__condition = threading.Condition()
+        self.switches = 0
+
+    @contextmanager
+    def use(self, domain: str, model_id: int):
+        self.__enter(domain, model_id)
+        try:
+            yield
+        finally:
+            with self.__condition:
+                self.__domains[domain].in_flight -= 1
+                self.__condition.notify_all()
+
+    def set(self, domain: str, model_id: int):
+        """Record a model change that was made outside of ``use``."""
+        with self.__condition:
+            state = self.__domains.setdefault(domain, _Domain())
+            state.active = model_id
+            state.known = True
+            self.__condition.notify_all()
+
+    def active(self) -> dict[str, int]:
+        with self.__condition:
+            return {
+                domain: state.active
+                for domain, state in self.__domains.items()
+                if state.known
+            }
+
+    def __enter(self, domain: str, model_id: int):
+        waiter = _Waiter(model_id)
+        with self.__condition:
+            state = self.__domains.setdefault(domain, _Domain())
+            state.waiting.append(waiter)
+            try:
+                while True:
+                    self.__condition.wait_for(
+                        lambda: not state.switching
+                        and (
+                            self.__may_join(state, waiter)
+                            or self.__may_switch(state, waiter)
+                        )
+                    )
+                    if self.__may_join(state, waiter):
+                        break
+                    # first in line and the domain is idle: read or switch its
+                    # model, with the lock released
+                    known, previous = state.known, state.active
+                    state.switching = True
+                    self.__condition.release()
+                    try:
+                        if not known:
+                            active = self.__read_model(domain)
+                        else:
+                            logging.info(
+                                f"Switching domain {domain} from model {previous} to {model_id}"
+                            )
+                            active = self.__write_model(domain, model_id)
+                    finally:
+                        self.__condition.acquire()
+                        state.switching = False
+                        self.__condition.notify_all()
+                    state.active = active
+                    state.known = True
+                    if known:
+                        self.switches += 1
+                        break
+            except BaseException:
+                state.waiting.remove(waiter)
+                self.__condition.notify_all()
+                raise
+            state.waiting.remove(waiter)
+            state.in_flight += 1
+            self.__condition.notify_all()
+
+    @staticmethod
+    def __may_join(state: _Domain, waiter: _Waiter) -> bool:
+        """The domain runs the model and nobody ahead waits for another one."""
+        if not state.known or state.active != waiter.model_id:
+            return False
+        for ahead in state.waiting:
+            if ahead is waiter:
+                return True
+            if ahead.model_id != waiter.model_id:
+                return False
+        return False
+
+    @staticmethod
+    def __may_switch(state: _Domain, waiter: _Waiter) -> bool:
+        return state.in_flight == 0 and state.waiting[0] is waiter
@@ -0,0 +1,183 @@
+import logging
+import math
+import random
+import threading
+import time
+
+from metrics import count
+
+
+class BackendUnavailableError(Exception):
+    """semantha® is considered unhealthy (or overloaded) and was not called."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and every
+    call fails fast with ``BackendUnavailableError``. Once ``reset_timeout``
+    seconds have passed a single probe call is let through (half open); its
+    success closes the circuit again, its failure keeps it open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.__failure_threshold = failure_threshold
+        self.__reset_timeout = reset_timeout
+        self.__state = self.CLOSED
+        self.__failures = 0
+        self.__opened_at = 0.0
+        self.__probing = False
+        self.__lock = threading.Lock()
+        self.rejected = 0
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            return self.__state
+
+    def before_call(self):
+        with self.__lock:
+            if self.__state == self.OPEN:
+                if time.monotonic() - self.__opened_at < self.__reset_timeout:
+                    self.rejected += 1
+                    raise BackendUnavailableError("semantha® circuit is open")
+                self.__transition(self.HALF_OPEN)
+            if self.__state == self.HALF_OPEN:
+                if self.__probing:
+                    self.rejected += 1
+                    raise BackendUnavailableError("semantha® circuit is half open")
+                self.__probing = True
+
+    def record(self, failed: bool):
+        with self.__lock:
+            self.__probing = False
+            if not failed:
+                self.__failures = 0
+                if self.__state != self.CLOSED:
+                    self.__transition(self.CLOSED)
+                return
+            self.__failures += 1
+            if self.__state == self.HALF_OPEN or (
+                self.__state == self.CLOSED
+                and self.__failures >= self.__failure_threshold
+            ):
+                self.__opened_at = time.monotonic()
+                self.trips += self.__state == self.CLOSED
+                self.__transition(self.OPEN)
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "state": self.__state,
+                "failures": self.__failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+    def __transition(self, state: str):
+        logging.warning(f"semantha® circuit {self.__state} -> {state}")
+        count("semantha_circuit_transitions", state=state)
+        self.__state = state
+
+
+class AdaptiveLimiter:
+    """Concurrency limit for backend calls that follows the observed latency.
+
+    A short-term and a long-term moving average of the call latency are kept.
+    While the short-term average stays within ``tolerance`` times the long-term
+    one and the limit is actually used, the limit grows by about its square
+    root; when the latency rises (the backend starts queueing) or calls fail, it
+    shrinks in proportion. ``smoothing`` is the weight of the latest call in the
+    short-term average and in the limit. Calls beyond the limit wait up to
+    ``queue_timeout`` seconds for a slot and are then rejected with
+    ``BackendUnavailableError``.
+    """
+
+    def __init__(
+        self,
+        initial=8,
+        min_limit=1,
+        max_limit=64,
+        tolerance=2.0,
+        smoothing=0.2,
+        queue_timeout=30.0,
+    ):
+        self.__limit = float(initial)
+        self.__min_limit = min_limit
+        self.__max_limit = max_limit
+        self.__tolerance = tolerance
+        self.__smoothing = smoothing
+        self.__queue_timeout = queue_timeout
+        self.__short_latency = None
+        self.__long_latency = None
+        self.__in_flight = 0
+        self.__condition = threading.Condition()
+        self.rejected = 0
+
+    @property
+    def limit(self) -> int:
+        with self.__condition:
+            return int(self.__limit)
+
+    def acquire(self):
+        with self.__condition:
+            if not self.__condition.wait_for(
+                lambda: self.__in_flight < int(self.__limit), self.__queue_timeout
+            ):
+                self.rejected += 1
+                raise BackendUnavailableError(
+                    f"semantha® is overloaded, {self.__in_flight} calls in flight"
+                )
+            self.__in_flight += 1
+
+    def release(self, latency: float, failed=False):
+        with self.__condition:
+            used = self.__in_flight
+            self.__in_flight -= 1
+            if self.__short_latency is None:
+                self.__short_latency = self.__long_latency = latency
+            self.__short_latency += self.__smoothing * (latency - self.__short_latency)
+            self.__long_latency += 0.01 * (latency - self.__long_latency)
+            if failed:
+                gradient = 0.5
+            else:
+                gradient = max(
+                    0.5,
+                    min(
+                        1.0,
+                        self.__tolerance * self.__long_latency / self.__short_latency,
+                    ),
+                )
+            # an application that does not use its limit says nothing about
+            # whether the backend could take more
+            headroom = math.sqrt(self.__limit) if used >= self.__limit / 2 else 0
+            target = self.__limit * gradient + (headroom if gradient == 1 else 0)
+            self.__limit = min(
+                self.__max_limit,
+                max(
+                    self.__min_limit,
+                    (1 - self.__smoothing) * self.__limit + self.__smoothing * target,
+                ),
+            )
+            self.__condition.notify_all()
+
+    def stats(self) -> dict:
+        with self.__condition:
+            return {
+                "limit": int(self.__limit),
+                "in_flight": self.__in_flight,
+                "rejected": self.rejected,
+                "short_latency_ms": round((self.__short_latency or 0) * 1000, 1),
+                "long_latency_ms": round((self.__long_latency or 0) * 1000, 1),
+            }
+
+
+def backoff_delays(retries: int, base=0.1, cap=2.0, rng=random):
+    """Exponential backoff with full jitter: ``uniform(0, min(cap, base * 2**n))``."""
+    for attempt in range(retries):
+        yield rng.uniform(0, min(cap, base * 2**attempt))
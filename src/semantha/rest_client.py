@@ -0,0 +1,158 @@
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from semantha_sdk.api.semantha_api import SemanthaAPI
+from semantha_sdk.request.semantha_request import SemanthaRequest
+from semantha_sdk.response.semantha_response import SemanthaPlatformResponse
+from semantha_sdk.rest.rest_client import RestClient
+
+from metrics import count
+from semantha.resilience import (
+    AdaptiveLimiter,
+    BackendUnavailableError,
+    CircuitBreaker,
+    backoff_delays,
+)
+
+_PLATFORM_SERVER_API_VERSION = "v3"
+# responses that say the backend is unhealthy rather than the request is wrong
+_UNHEALTHY_STATUS = {429, 500, 502, 503, 504}
+
+
+class _PooledRequest:
+    def __init__(self, request: SemanthaRequest, client: "PooledRestClient"):
+        # the SDK keeps the prepared request private and sends it through a
+        # throw-away Session, which costs a TCP/TLS handshake per call
+        self.__prepared_request = request._SemanthaRequest__prepared_request
+        self.__client = client
+
+    def execute(self) -> SemanthaPlatformResponse:
+        return SemanthaPlatformResponse(self.__client.send(self.__prepared_request))
+
+
+class PooledRestClient(RestClient):
+    """RestClient that sends all requests through one keep-alive session.
+
+    The underlying urllib3 connection pool is thread-safe, so one client can be
+    shared by every Streamlit session of the process.
+
+    Every request is bounded by ``timeout`` (connect, read) seconds, admitted by
+    an ``AdaptiveLimiter`` and guarded by a ``CircuitBreaker``. Idempotent GETs
+    that time out, cannot connect or get a 429/5xx response are retried up to
+    ``retries`` times with jittered exponential backoff; if the last attempt
+    fails as well, ``BackendUnavailableError`` is raised.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        api_key: str,
+        pool_size=16,
+        timeout=(3.05, 60),
+        retries=2,
+        breaker: CircuitBreaker = None,
+        limiter: AdaptiveLimiter = None,
+    ):
+        super().__init__(server_url, api_key)
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.__session.mount("http://", adapter)
+        self.__session.mount("https://", adapter)
+        self.__timeout = timeout
+        self.__retries = retries
+        self.__breaker = breaker if breaker is not None else CircuitBreaker()
+        self.__limiter = (
+            limiter
+            if limiter is not None
+            else AdaptiveLimiter(initial=pool_size // 2, max_limit=pool_size)
+        )
+
+    def get(self, url, q_params=None):
+        return _PooledRequest(super().get(url, q_params), self)
+
+    def post(self, url, body=None, json=None, q_params=None, headers=None):
+        return _PooledRequest(super().post(url, body, json, q_params, headers), self)
+
+    def delete(self, url, q_params=None, json=None):
+        return _PooledRequest(super().delete(url, q_params, json), self)
+
+    def patch(self, url, body=None, json=None, q_params=None):
+        return _PooledRequest(super().patch(url, body, json, q_params), self)
+
+    def put(self, url, body=None, json=None, q_params=None):
+        return _PooledRequest(super().put(url, body, json, q_params), self)
+
+    def send(self, prepared_request: requests.PreparedRequest) -> requests.Response:
+        retries = self.__retries if prepared_request.method == "GET" else 0
+        delays = backoff_delays(retries)
+        while True:
+            error = None
+            try:
+                response = self.__send_once(prepared_request)
+                if response.status_code not in _UNHEALTHY_STATUS:
+                    return response
+                problem = f"status {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, problem = e, type(e).__name__
+            delay = next(delays, None)
+            if delay is None:
+                raise BackendUnavailableError(
+                    f"{prepared_request.method} {prepared_request.path_url} "
+                    f"failed with {problem}"
+                ) from error
+            logging.info(
+                f"Retrying {prepared_request.method} {prepared_request.path_url} "
+                f"after {problem} in {delay:.2f}s"
+            )
+            count("semantha_retries", operation=prepared_request.method)
+            time.sleep(delay)
+
+    def close(self):
+        self.__session.close()
+
+    def __send_once(self, prepared_request):
+        self.__breaker.before_call()
+        try:
+            self.__limiter.acquire()
+        except BackendUnavailableError:
+            # calls that cannot even be admitted count against the backend
+            self.__breaker.record(failed=True)
+            raise
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.__session.send(prepared_request, timeout=self.__timeout)
+            failed = response.status_code in _UNHEALTHY_STATUS
+            return response
+        finally:
+            self.__limiter.release(time.perf_counter() - start, failed)
+            self.__breaker.record(failed)
+
+
+def login(
+    server_url: str,
+    api_key: str,
+    pool_size=16,
+    timeout=(3.05, 60),
+    retries=2,
+    breaker: CircuitBreaker = None,
+    limiter: AdaptiveLimiter = None,
+) -> SemanthaAPI:
+    """Same as ``semantha_sdk.login`` but backed by a ``PooledRestClient``."""
+    if not server_url.endswith("/tt-platform-server"):
+        server_url += "/tt-platform-server"
+    if not api_key:
+        raise ValueError("You need to supply an API key to login.")
+    api = SemanthaAPI(
+        PooledRestClient(
+            server_url, api_key, pool_size, timeout, retries, breaker, limiter
+        ),
+        f"/api/{_PLATFORM_SERVER_API_VERSION}",
+        "/api",
+    )
+    # check whether API key is valid or not
+    info = api.info.get()
+    logging.info(f"Semantha API version: {info.version}")
+    return api
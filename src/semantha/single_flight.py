@@ -0,0 +1,50 @@
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    While a call for ``key`` is running, further ``do`` calls with the same key
+    wait for its result (or exception) instead of calling ``function`` again.
+    """
+
+    def __init__(self):
+        self.__in_flight = {}
+        self.__lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        with self.__lock:
+            future = self.__in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.__in_flight[key] = future
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.__lock:
+                del self.__in_flight[key]
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {
+                "in_flight": len(self.__in_flight),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+            }
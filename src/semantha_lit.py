@@ -1,29 +1,60 @@
+import importlib
+
 import streamlit as st
-from PIL import Image
 
 from abstract_page import AbstractPage
-from subpage.semantic_compare import SemanticCompare
-from subpage.semantic_search import SemanticSearch
-from subpage.smart_cluster import SmartCluster
-from subpage.rag import RAG
+from metrics import serve_metrics, span
+from warmup import start_warm_up
+
+# page name -> (module, class); a page module is only imported once the page
+# is selected for the first time
+PAGES = {
+    "🦸🏼‍♀️ Semantic Compare": ("subpage.semantic_compare", "SemanticCompare"),
+    "🔍 Semantic Search": ("subpage.semantic_search", "SemanticSearch"),
+    "✨ Smart Cluster": ("subpage.smart_cluster", "SmartCluster"),
+    "💬 Retrieval Augmented Generation": ("subpage.rag", "RAG"),
+}
+# the page modules with a warm_up_tasks function; the warm-up imports only
+# these, on its own thread
+WARM_UP_PAGES = (
+    "subpage.semantic_compare",
+    "subpage.semantic_search",
+    "subpage.smart_cluster",
+)
+# hidden performance panel, opened with ?debug=1 in the URL
+DEBUG_PAGES = {"🛠️ Debug": ("subpage.debug", "Debug")}
+
+
+def load_page(module: str, class_name: str) -> AbstractPage:
+    return getattr(importlib.import_module(module), class_name)()
 
 
 class SemanthaLit(AbstractPage):
     def __init__(self):
         super().__init__("playground")
         self.__page_config()
+        serve_metrics()
+        start_warm_up(
+            WARM_UP_PAGES,
+            st.secrets["semantha"]["server_url"],
+            st.secrets["semantha"]["api_key"],
+        )
 
     def build(self):
         self.page_description()
-        pages = [SemanticCompare(), SemanticSearch(), SmartCluster(), RAG()]
-        tabs = st.tabs([t.name() for t in pages])
-        for i in range(len(pages)):
-            with tabs[i]:
-                pages[i].build()
+        pages = dict(PAGES)
+        if "debug" in st.experimental_get_query_params():
+            pages.update(DEBUG_PAGES)
+        # unlike st.tabs, which renders every tab on each rerun, only the
+        # selected page is constructed and built
+        name = st.radio(
+            "Page", list(pages), horizontal=True, label_visibility="collapsed"
+        )
+        with span("page_build", domain=name, operation="build"):
+            load_page(*pages[name]).build()
 
     def page_description(self):
-        image = Image.open("data/Semantha-PLAYGROUND_positiv-RGB.png")
-        st.image(image, use_column_width="always")
+        st.image("data/Semantha-PLAYGROUND_positiv-RGB.png", use_column_width="always")
         st.markdown(
             "This is an interactive application to demonstrate some of semantha®'s capabilities. Feel free to play "
             "around and have some fun. But don't fall off the swing."
@@ -0,0 +1,108 @@
+import pandas as pd
+import streamlit as st
+from src.abstract_page import SemanthaBasePage
+from cluster.data_store import frame_store
+from metrics import METRICS
+from warmup import warm_up
+
+
+class Debug(SemanthaBasePage):
+    """Performance panel of the running process, shown with ``?debug=1`` in the URL."""
+
+    def __init__(self):
+        super().__init__("🛠️ Debug")
+
+    def build(self):
+        self.page_description()
+        with st.expander("⏱️ Latencies", expanded=True):
+            st.dataframe(self.__span_frame(METRICS.spans()), use_container_width=True)
+        with st.expander("🎯 Cache hit rates", expanded=True):
+            st.dataframe(
+                self.__hit_rate_frame(METRICS.counters()), use_container_width=True
+            )
+            stats = self._semantha_connector.cache_stats()
+            stats["frames"] = frame_store().stats()
+            st.dataframe(
+                pd.DataFrame.from_dict(stats, orient="index"),
+                use_container_width=True,
+            )
+        with st.expander("🔥 Warm-up", expanded=False):
+            self.__warm_up()
+        with st.expander("📄 Prometheus metrics", expanded=False):
+            text = METRICS.prometheus()
+            st.download_button("Download", text, file_name="metrics.txt")
+            st.code(text, language="text")
+        if st.button("Reset metrics"):
+            METRICS.reset()
+
+    def page_description(self):
+        st.write(
+            "Timings and counters of this app process since its start (or the last reset), over all sessions. "
+            "Latencies are computed from the last 1024 observations of each series."
+        )
+
+    @staticmethod
+    def __warm_up():
+        current = warm_up()
+        if current is None:
+            st.info("The caches were not warmed up in this process.")
+            return
+        summary = current.summary()
+        if summary["ready"]:
+            st.success(
+                f"Ready after {summary['elapsed']}s: {summary['done']} of "
+                f"{summary['tasks']} tasks done, {summary['failed']} failed."
+            )
+        else:
+            st.warning(
+                f"Warming up for {summary['elapsed']}s: {summary['done']} of "
+                f"{summary['tasks']} tasks done."
+            )
+        st.dataframe(pd.DataFrame(current.status()), use_container_width=True)
+
+    @staticmethod
+    def __span_frame(spans):
+        frame = pd.DataFrame(
+            [
+                {
+                    "Span": s["name"],
+                    "Domain": s["labels"].get("domain"),
+                    "Operation": s["labels"].get("operation"),
+                    "Count": s["count"],
+                    "Errors": s["errors"],
+                    "p50 ms": s.get("p50", 0) * 1000,
+                    "p95 ms": s.get("p95", 0) * 1000,
+                }
+                for s in spans
+            ],
+            columns=["Span", "Domain", "Operation", "Count", "Errors"]
+            + ["p50 ms", "p95 ms"],
+        )
+        return frame.round(1)
+
+    @staticmethod
+    def __hit_rate_frame(counters):
+        frame = pd.DataFrame(
+            [
+                {
+                    "Domain": c["labels"].get("domain"),
+                    "Operation": c["labels"].get("operation"),
+                    "Result": c["labels"].get("result"),
+                    "Count": c["value"],
+                }
+                for c in counters
+                if c["name"] == "semantha_cache_lookups"
+            ],
+            columns=["Domain", "Operation", "Result", "Count"],
+        )
+        lookups = frame.pivot_table(
+            index=["Domain", "Operation"],
+            columns="Result",
+            values="Count",
+            aggfunc="sum",
+            fill_value=0,
+        ).reindex(columns=["hit", "miss"], fill_value=0)
+        lookups["hit rate"] = (
+            lookups["hit"] / (lookups["hit"] + lookups["miss"])
+        ).round(3)
+        return lookups
@@ -1,21 +1,103 @@
 import ast
 import os
+import time
 import streamlit as st
 from src.abstract_page import SemanthaBasePage
 from data.read_config import read_config
+from metrics import observe, span
+from rag.generators import get_generator
+from rag.retrieval import Conversation, get_retriever
 
 __config_path = os.path.join("rag", "config.toml")
 CONFIG = read_config(__config_path)
 
 
+def _value(text: str):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
 class RAG(SemanthaBasePage):
     def __init__(self):
         super().__init__("💬 Retrieval Augmented Generation")
         self.__use_cases = ast.literal_eval(CONFIG["domains"]["use_cases"])
+        self.__domain_prefix = CONFIG["domains"]["domain_prefix"]
+        self.__retrieval = {k: _value(v) for k, v in CONFIG["retrieval"].items()}
+        self.__generator_settings = {
+            k: _value(v) for k, v in CONFIG["generator"].items()
+        }
 
     def build(self):
         self.page_description()
-        self.__use_case_selection()
+        choice = self.__use_case_selection()
+        self.__chat(choice)
+
+    def __chat(self, choice):
+        # the conversation is kept per use case for the reruns of the page
+        history = st.session_state.setdefault("rag_history", {}).setdefault(choice, [])
+        conversation = st.session_state.setdefault("rag_conversations", {}).setdefault(
+            choice, Conversation()
+        )
+        for question, answer, sources in history:
+            self.__show_turn(question, answer, sources)
+        question = st.chat_input(self.__use_cases[choice]["default_question"])
+        if not question:
+            return
+        use_case = self.__use_cases[choice]
+        domain = self.__domain_prefix + use_case["domain"]
+        with st.chat_message("user"):
+            st.write(question)
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            start = time.perf_counter()
+            with st.spinner("🦸🏼‍♀️ I am looking for relevant passages..."):
+                context = get_retriever(
+                    self._semantha_connector,
+                    domain,
+                    use_case["tags"],
+                    **self.__retrieval,
+                ).context(question, conversation=conversation)
+            answer = ""
+            with span("rag", domain=domain, operation="generate"):
+                for chunk in self.__generator().stream(question, context):
+                    if not answer:
+                        observe(
+                            "rag_first_token",
+                            time.perf_counter() - start,
+                            domain=domain,
+                            operation="answer",
+                        )
+                    answer += chunk
+                    placeholder.markdown(answer + "▌")
+            placeholder.markdown(answer)
+            sources = [(p.name, p.similarity) for p in context.passages]
+            self.__show_sources(sources)
+        history.append((question, answer, sources))
+
+    def __generator(self):
+        settings = dict(self.__generator_settings)
+        if "generator" in st.secrets:
+            settings.update(st.secrets["generator"])
+        return get_generator(settings.pop("backend"), **settings)
+
+    def __show_turn(self, question, answer, sources):
+        with st.chat_message("user"):
+            st.write(question)
+        with st.chat_message("assistant"):
+            st.markdown(answer)
+            self.__show_sources(sources)
+
+    @staticmethod
+    def __show_sources(sources):
+        if not sources:
+            return
+        with st.expander("📚 Sources", expanded=False):
+            for number, (name, similarity) in enumerate(sources, 1):
+                st.markdown(
+                    f"[{number}] **{name}** ({int(round(similarity, 2) * 100)}%)"
+                )
 
     def __use_case_selection(self):
         with st.expander("🔘 Use Case Selection", expanded=True):
@@ -28,6 +110,7 @@ class RAG(SemanthaBasePage):
 
             link = self.__use_cases[choice]["link"]
             st.info(f"Click on the link to learn more about [{choice}]({link}).")
+        return choice
 
     def page_description(self):
         st.markdown(
@@ -39,3 +122,8 @@ class RAG(SemanthaBasePage):
         st.markdown(
             "Unlike others, all the processing is done in the EU and your **data remains private**. Try it out!"
         )
+        st.caption(
+            "Follow-up questions on the same topic reuse the passages found for an earlier question of the conversation. "
+            "Whether a question is a follow-up, and how the reused passages are ranked for it, is decided by the words "
+            "the question shares with them, not by semantha®'s semantic similarity."
+        )
@@ -1,22 +1,90 @@
 import ast
+import functools
+import itertools
 import os
+import pandas as pd
 import streamlit as st
 from src.abstract_page import SemanthaBasePage
 from data.read_config import read_config
 
-__config_path = os.path.join(os.path.dirname(__file__), "..", "..", "data", "semantic_compare", "config.toml")
+__config_path = os.path.join(
+    os.path.dirname(__file__), "..", "..", "data", "semantic_compare", "config.toml"
+)
 CONFIG = read_config(__config_path)
 
 
+def warm_up_tasks(connector):
+    """The compares of the default texts with the default model."""
+    model_id = next(iter(ast.literal_eval(CONFIG["models"]["ids"]).values()))
+    domain = ast.literal_eval(CONFIG["models"]["domains"]).get(
+        model_id, CONFIG["domain"]["name"]
+    )
+
+    def compare(texts, omd):
+        connector().do_semantic_string_compare(
+            texts[0], texts[1], domain, model_id, omd
+        )
+
+    return [
+        (
+            domain,
+            f"compare_{name}",
+            functools.partial(compare, ast.literal_eval(CONFIG["text"][name]), omd),
+        )
+        for name, omd in (("default", False), ("omd", True))
+    ]
+
+
+_TRUE = {"true", "yes", "y", "x", "1", "1.0"}
+_FALSE = {"false", "no", "n", "0", "0.0"}
+
+
+def _flag(value, default: bool):
+    if pd.isna(value) or str(value).strip() == "":
+        return default
+    value = str(value).strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    return None
+
+
+def pairs_from_table(table: pd.DataFrame, do_omd: bool) -> list[tuple]:
+    """The ``(input_0, input_1, omd)`` pairs of an uploaded table.
+
+    The first two columns hold the texts. An optional third column decides per
+    pair whether the opposite meaning is detected (true/false, yes/no, 1/0 or
+    x); pairs with an empty cell there use ``do_omd``.
+    """
+    if table.shape[1] < 2:
+        raise ValueError("the file needs two columns with the texts to compare")
+    if table.shape[0] == 0:
+        raise ValueError("the file contains no pairs")
+    texts = table.iloc[:, :2].fillna("").astype(str)
+    if table.shape[1] > 2:
+        omd = [_flag(value, do_omd) for value in table.iloc[:, 2]]
+        invalid = [row for row, flag in enumerate(omd, start=1) if flag is None]
+        if invalid:
+            raise ValueError(
+                f"the third column must be true or false, see row(s) "
+                f"{', '.join(map(str, invalid[:10]))}"
+            )
+    else:
+        omd = [do_omd] * table.shape[0]
+    return list(zip(texts.iloc[:, 0], texts.iloc[:, 1], omd))
+
+
 class SemanticCompare(SemanthaBasePage):
     def __init__(self):
         super().__init__("🦸🏼‍♀️ Semantic Compare")
         self.__models = ast.literal_eval(CONFIG["models"]["ids"])
         self.__compare_domain = CONFIG["domain"]["name"]
+        self.__model_domains = ast.literal_eval(CONFIG["models"]["domains"])
         self.__text = ast.literal_eval(CONFIG["text"]["default"])
         self.__omd_text = ast.literal_eval(CONFIG["text"]["omd"])
-        if "selected_model" not in st.session_state:
-            st.session_state.selected_model = None
+        self.__max_pairs = int(CONFIG["batch"]["max_pairs"])
+        self.__max_concurrency = int(CONFIG["batch"]["max_concurrency"])
 
     def build(self):
         self.page_description()
@@ -25,6 +93,8 @@ class SemanticCompare(SemanthaBasePage):
 
         self.__similarity_computation(curr_model)
 
+        self.__batch_computation(curr_model)
+
     def page_description(self):
         st.write(
             "Directly compare two texts in any language by entering them below. The texts will be compared using "
@@ -59,6 +129,113 @@ class SemanticCompare(SemanthaBasePage):
                         input_0, input_1, self.__models[curr_model], __do_omd
                     )
 
+    def __batch_computation(self, curr_model):
+        with st.expander("📑 Batch Compare", expanded=False):
+            mode = st.radio(
+                "Which pairs would you like to compare?",
+                ("Pairs from a table", "All pairs of two lists"),
+                horizontal=True,
+                help="Upload a CSV or Excel file with one pair per row (first two columns, an optional third column "
+                "switches the opposite meaning detection on or off per pair and overrides the checkbox below), or "
+                "enter two lists to compare every text of the first list with every text of the second one.",
+            )
+            do_omd = st.checkbox(
+                "Opposite Meaning Detection",
+                value=False,
+                key="batch_omd",
+                help="Check whether similar texts have an opposite meaning.",
+            )
+            if mode == "Pairs from a table":
+                pairs = self.__pairs_from_upload(do_omd)
+                total = len(pairs)
+                pairs = pairs[: self.__max_pairs]
+            else:
+                pairs, total = self.__pairs_from_lists(self.__max_pairs)
+            if total > self.__max_pairs:
+                st.warning(
+                    f"Only the first {self.__max_pairs} of {total} pairs will be compared."
+                )
+            _, col, _ = st.columns([1, 1, 1])
+            if col.button(
+                "⇆ Compare all pairs", key="batchbutton", disabled=len(pairs) == 0
+            ):
+                self.__compute_and_display_batch(
+                    pairs, self.__models[curr_model], do_omd
+                )
+
+    @staticmethod
+    def __pairs_from_upload(do_omd):
+        file = st.file_uploader("Pairs", type=["csv", "xlsx"], key="batch_file")
+        if file is None:
+            return []
+        try:
+            if file.name.endswith(".csv"):
+                table = pd.read_csv(file)
+            else:
+                table = pd.read_excel(file)
+            return pairs_from_table(table, do_omd)
+        # pandas' EmptyDataError is a ValueError as well
+        except ValueError as e:
+            st.error(f"Cannot read the pairs from {file.name}: {e}")
+            return []
+
+    @staticmethod
+    def __pairs_from_lists(max_pairs):
+        col_0, col_1 = st.columns(2)
+        list_0 = col_0.text_area("Texts I", help="One text per line.")
+        list_1 = col_1.text_area("Texts II", help="One text per line.")
+        texts_0 = [t for t in list_0.splitlines() if t.strip()]
+        texts_1 = [t for t in list_1.splitlines() if t.strip()]
+        # only the pairs that are compared are built, long lists have millions
+        pairs = list(itertools.islice(itertools.product(texts_0, texts_1), max_pairs))
+        return pairs, len(texts_0) * len(texts_1)
+
+    def __compute_and_display_batch(self, pairs, model_id: int, do_omd: bool):
+        result = pd.DataFrame(
+            {
+                "Input I": [p[0] for p in pairs],
+                "Input II": [p[1] for p in pairs],
+                "Similarity": pd.Series([None] * len(pairs), dtype="Int64"),
+                "Opposite Meaning": pd.Series([None] * len(pairs), dtype="boolean"),
+                "Error": pd.Series([None] * len(pairs), dtype="string"),
+            }
+        )
+        progress = st.progress(0.0, text="🦸🏼‍♀️ I am comparing your pairs...")
+        table = st.empty()
+        for done, (index, omd, similarity, error) in enumerate(
+            self._semantha_connector.iter_compare_batch(
+                pairs,
+                self.__domain_for(model_id),
+                model_id,
+                do_omd,
+                max_concurrency=self.__max_concurrency,
+            ),
+            start=1,
+        ):
+            if error is None:
+                result.at[index, "Similarity"] = int(round(similarity, 2) * 100)
+                pair_omd = pairs[index][2] if len(pairs[index]) > 2 else do_omd
+                # n/a for the pairs that were compared without the detection
+                if pair_omd:
+                    result.at[index, "Opposite Meaning"] = bool(omd)
+            else:
+                result.at[index, "Error"] = error
+            progress.progress(
+                done / len(pairs), text=f"Compared {done} of {len(pairs)} pairs"
+            )
+            if done % self.__max_concurrency == 0:
+                # the compared pairs so far, failed ones with their error
+                finished = result["Similarity"].notna() | result["Error"].notna()
+                table.dataframe(result[finished].head(100))
+        progress.empty()
+        table.dataframe(result)
+        st.download_button(
+            "⬇️ Download results",
+            result.to_csv(index=False).encode("utf-8"),
+            file_name="semantic_compare.csv",
+            mime="text/csv",
+        )
+
     def __model_selection(self):
         with st.expander("⚙️ Model Selection", expanded=True):
             curr_model = st.selectbox(
@@ -67,19 +244,18 @@ class SemanticCompare(SemanthaBasePage):
                 help="Select a model to use for the comparison. Each model has a different accuracy and speed.",
                 label_visibility="collapsed",
             )
-            with st.spinner("Changing the model. Just a second..."):
-                if curr_model != st.session_state.selected_model:
-                    _ = self._semantha_connector.change_model(
-                        self.__compare_domain, self.__models[curr_model]
-                    )
-                    st.session_state.selected_model = curr_model
         return curr_model
 
+    def __domain_for(self, model_id: int) -> str:
+        # models with their own domain never need a settings change on the
+        # shared compare domain
+        return self.__model_domains.get(model_id, self.__compare_domain)
+
     def __compute_and_display_similarity(
         self, input_0: str, input_1: str, model_id: int, __do_omd: bool
     ):
         __omd, similarity = self._semantha_connector.do_semantic_string_compare(
-            input_0, input_1, self.__compare_domain, model_id, __do_omd
+            input_0, input_1, self.__domain_for(model_id), model_id, __do_omd
         )
         sim = int(round(similarity, 2) * 100)
         if sim >= 70:
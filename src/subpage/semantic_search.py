@@ -1,8 +1,11 @@
 import ast
+import functools
+import io
 import os
 import streamlit as st
 import pandas as pd
 from src.abstract_page import SemanthaBasePage
+from components.table import frame_loader, paged_table
 from data.read_config import read_config
 
 __config_path = os.path.join(
@@ -11,11 +14,49 @@ __config_path = os.path.join(
 CONFIG = read_config(__config_path)
 
 
+def warm_up_tasks(connector):
+    """The default search and the first library page of every use case."""
+    prefix = CONFIG["search_domains"]["domain_prefix"]
+    page_size = int(CONFIG["library"]["page_size"])
+
+    def search(domain, config):
+        connector().query_library(
+            config["default_query"],
+            domain,
+            threshold=config["threshold"],
+            tags=config["search_tags"],
+        )
+
+    def library(domain, tags):
+        connector().library_size(domain, tags)
+        # the same page requests as the first page of the library table
+        for _ in connector().iter_library(
+            domain, tags=tags, limit=page_size, page_size=page_size
+        ):
+            pass
+
+    tasks = []
+    for use_case, config in ast.literal_eval(
+        CONFIG["search_domains"]["use_cases"]
+    ).items():
+        domain = prefix + use_case
+        tasks.append((domain, "search", functools.partial(search, domain, config)))
+        tasks.append(
+            (
+                domain,
+                "library",
+                functools.partial(library, domain, config["library_tags"]),
+            )
+        )
+    return tasks
+
+
 class SemanticSearch(SemanthaBasePage):
     def __init__(self):
         super().__init__("🔍 Semantic Search")
         self.__domain_prefix = CONFIG["search_domains"]["domain_prefix"]
         self.__use_cases = ast.literal_eval(CONFIG["search_domains"]["use_cases"])
+        self.__library_page_size = int(CONFIG["library"]["page_size"])
 
     def build(self):
         self.page_description()
@@ -43,40 +84,115 @@ class SemanticSearch(SemanthaBasePage):
     def __compute_matches(self, search_string, use_case):
         _, _, col, _, _ = st.columns(5)
         if col.button("🔍 Search"):
-            with st.spinner("🦸🏼‍♀️ I am searching for matches..."):
-                results = self._semantha_connector.query_library(
-                    search_string,
-                    self.__domain_prefix + use_case,
-                    threshold=self.__use_cases[use_case]["threshold"],
-                    tags=self.__use_cases[use_case]["search_tags"],
-                )
+            matches = self.__search(search_string, use_case)
             st.success("Done! Here are your matches!", icon="🦸🏼‍♀️")
-            self.__display_matches(results)
+            # kept for the reruns caused by paging through the matches
+            st.session_state.search_matches = (use_case, search_string, matches)
+        use_case_, search_string_, matches = st.session_state.get(
+            "search_matches", (None, None, None)
+        )
+        if (use_case_, search_string_) == (use_case, search_string):
+            self.__display_matches(matches)
+
+    def __search(self, search_string, use_case):
+        config = self.__use_cases[use_case]
+        domain = self.__domain_prefix + use_case
+        with st.spinner("🦸🏼‍♀️ I am searching for matches..."):
+            ranked, records = self._semantha_connector.stream_query_library(
+                search_string,
+                domain,
+                threshold=config["threshold"],
+                tags=config["search_tags"],
+            )
+        return self.__stream_matches(ranked, records)
+
+    @staticmethod
+    def __stream_matches(ranked, records):
+        """Show the ranking at once and fill in the documents as they arrive."""
+        similarities = pd.Series([similarity for _, similarity in ranked], dtype=float)
+        matches = pd.DataFrame(
+            {
+                "Name": pd.Series([None] * len(ranked), dtype=object),
+                "Content": pd.Series([None] * len(ranked), dtype=object),
+                "Similarity": (similarities.round(2) * 100).astype(int),
+            }
+        )
+        table = st.empty()
 
-    def __display_matches(self, results):
+        def show():
+            table.dataframe(
+                matches.set_axis(pd.RangeIndex(1, len(matches) + 1, name="Rank")),
+                use_container_width=True,
+            )
+
+        show()
+        for rank, record in records:
+            matches.loc[rank, ["Name", "Content"]] = [
+                record["doc_name"],
+                record["content"],
+            ]
+            show()
+        # replaced by the paged table once every document is there
+        table.empty()
+        return matches
+
+    def __display_matches(self, matches):
         with st.expander("Matches", expanded=True):
-            matches = self.__get_matches(results)
-            st.write(matches)
+            paged_table(
+                "search_matches",
+                frame_loader(matches),
+                len(matches),
+                page_size=self.__library_page_size,
+                html_columns=["Content"],
+                index_name="Rank",
+            )
 
     def __display_library(self, use_case):
         _, _, col, _, _ = st.columns(5)
         if col.button("📖 Library"):
-            with st.spinner("🦸🏼‍♀️ I am fetching the library..."):
-                with st.expander("First 100 entries", expanded=True):
-                    lib = self._semantha_connector.get_library(
-                        self.__domain_prefix + use_case,
-                        tags=self.__use_cases[use_case]["library_tags"],
-                        limit=100,
-                    )
-                    lib_df = pd.DataFrame.from_records(
-                        [
-                            [r["doc_name"], r["content"].replace("\n", "<br>")]
-                            for r in lib
-                        ],
-                        columns=["Name", "Content"],
-                    )
-                    lib_df.index = range(1, lib_df.shape[0] + 1)
-                    st.write(lib_df)
+            st.session_state.search_library = use_case
+        if st.session_state.get("search_library") != use_case:
+            return
+        domain = self.__domain_prefix + use_case
+        tags = self.__use_cases[use_case]["library_tags"]
+        with st.spinner("🦸🏼‍♀️ I am fetching the library..."):
+            with st.expander("📖 Library", expanded=True):
+                # only the documents of the visible page are fetched
+                paged_table(
+                    f"search_library_{use_case}",
+                    lambda offset, limit, sort_by, descending: self.__get_library_page(
+                        domain, tags, offset, limit, sort_by, descending
+                    ),
+                    self._semantha_connector.library_size(domain, tags),
+                    page_size=self.__library_page_size,
+                    sort_columns=["Name"],
+                    html_columns=["Content"],
+                )
+                self.__export_library(use_case, domain, tags)
+
+    def __export_library(self, use_case, domain, tags):
+        if not st.button("⬇️ Export", key=f"search_library_export_{use_case}"):
+            return
+        with st.spinner("🦸🏼‍♀️ I am exporting the library..."):
+            # streamed page by page, only the CSV is held in memory
+            export = io.StringIO()
+            count = self._semantha_connector.export_library(domain, export, tags=tags)
+        st.download_button(
+            f"💾 Download {count} documents (CSV)",
+            export.getvalue(),
+            file_name=f"{use_case}.csv",
+            mime="text/csv",
+            key=f"search_library_download_{use_case}",
+        )
+
+    def __get_library_page(self, domain, tags, offset, limit, sort_by, descending):
+        sort = None if sort_by is None else f"{'-' if descending else ''}name"
+        records = self._semantha_connector.iter_library(
+            domain, tags=tags, offset=offset, limit=limit, page_size=limit, sort=sort
+        )
+        return pd.DataFrame(records, columns=["doc_name", "content"]).rename(
+            columns={"doc_name": "Name", "content": "Content"}
+        )
 
     def __use_case_selection(self):
         domains = self.__use_cases.keys()
@@ -87,20 +203,3 @@ class SemanticSearch(SemanthaBasePage):
             "select one of them here and search for your query.",
         )
         return option
-
-    @staticmethod
-    def __get_matches(results):
-        matches = pd.DataFrame.from_records(
-            [
-                [
-                    r["doc_name"],
-                    r["content"].replace("\n", "<br>"),
-                    int(round(r["similarity"], 2) * 100),
-                ]
-                for r in list(results.values())
-            ],
-            columns=["Name", "Content", "Similarity"],
-        )
-        matches.index = range(1, matches.shape[0] + 1)
-        matches.index.name = "Rank"
-        return matches
@@ -1,17 +1,57 @@
-import json
 import ast
+import functools
+import hashlib
 import os
 
 import pandas as pd
-import plotly.io as pio
 import streamlit as st
 from src.abstract_page import AbstractPage
 from data.read_config import read_config
+from components.table import frame_loader, paged_table
+from cluster.data_store import DOCUMENT_TOPICS, column_view, get_documents, get_frame
+from cluster.figure_store import figure_store
+from metrics import span
 
 _data_path = os.path.join(os.path.dirname(__file__), "..", "..", "data", "smartcluster")
 __config_path = os.path.join(_data_path, "config.toml")
 CONFIG = read_config(__config_path)
 
+_UPLOAD = "📤 Your documents"
+
+
+def _figure_store():
+    return figure_store(
+        max_entries=int(CONFIG["figures"]["cache_size"]),
+        max_points=int(CONFIG["figures"]["max_points"]),
+        max_hover_chars=int(CONFIG["figures"]["max_hover_chars"]),
+    )
+
+
+def warm_up_tasks(connector):
+    """The workbooks of every use case and the figures of its default view.
+
+    Only the broad document maps are decoded, so that the figure cache keeps
+    room for the views the visitors actually open.
+    """
+    tasks = []
+    for use_case in ast.literal_eval(CONFIG["use_cases"]["names"]).values():
+        paths = [
+            os.path.join(_data_path, use_case, name)
+            for name in ("data.xlsx", DOCUMENT_TOPICS)
+        ] + [
+            os.path.join(_data_path, use_case, g, f"{g}_excel.xlsx")
+            for g in ("broad", "fine")
+        ]
+        for path in paths:
+            if os.path.exists(path):
+                operation = os.path.splitext(os.path.basename(path))[0]
+                tasks.append((use_case, operation, functools.partial(get_frame, path)))
+        figure = os.path.join(_data_path, use_case, "broad", "broad_doc_map.json")
+        tasks.append(
+            (use_case, "broad_doc_map", functools.partial(_figure_store().get, figure))
+        )
+    return tasks
+
 
 class SmartCluster(AbstractPage):
     def __init__(self):
@@ -19,21 +59,105 @@ class SmartCluster(AbstractPage):
         self._use_cases = ast.literal_eval(CONFIG["use_cases"]["names"])
         self._tot_use_cases = ast.literal_eval(CONFIG["use_cases"]["topics_over_time"])
         self._use_case = None
+        self._figures = _figure_store()
+        self._engine_config = dict(
+            broad_topics=int(CONFIG["engine"]["broad_topics"]),
+            fine_topics=int(CONFIG["engine"]["fine_topics"]),
+            outlier_threshold=float(CONFIG["engine"]["outlier_threshold"]),
+        )
 
     def build(self):
         self.page_description()
         selected_case = st.selectbox(
             "📚 Use-Case",
-            (self._use_cases.keys()),
+            list(self._use_cases.keys()) + [_UPLOAD],
             help="We have pre-filled the library with documents from different use cases. Select one to see how the "
-            "documents are clustered.",
+            "documents are clustered, or upload your own documents.",
         )
+        if selected_case == _UPLOAD:
+            self.__build_upload()
+            return
         self._use_case = self._use_cases[selected_case]
         data = self.__load_data()
         granularity = self.__determine_granularity()
         _, col, _ = st.columns(3)
         self.__sort_documents(data, granularity, col)
 
+    def __build_upload(self):
+        # the clustering engine is only needed for uploaded documents
+        from cluster.engine import ClusteringEngine
+        from cluster.figures import document_map, topic_map
+
+        data = self.__load_upload()
+        if data is None:
+            return
+        granularity = self.__determine_granularity()
+        _, col, _ = st.columns(3)
+        if col.button("✨ Cluster documents", key="cluster_upload"):
+            st.session_state.upload_clustered = True
+        if not st.session_state.get("upload_clustered", False):
+            return
+        key = hashlib.sha256(
+            pd.util.hash_pandas_object(data).values.tobytes()
+        ).hexdigest()
+        if st.session_state.get("upload_result", (None, None))[0] != key:
+            with st.spinner("🦸🏼‍♀️ Finding clusters..."):
+                try:
+                    result = ClusteringEngine(**self._engine_config).cluster(
+                        data["Name"].tolist(), data["Content"].tolist()
+                    )
+                except ValueError as e:
+                    st.error(f"Your documents cannot be clustered: {e}")
+                    return
+            st.session_state.upload_result = (key, result)
+        result = st.session_state.upload_result[1]
+        self.__show_sorted_documents(
+            result.documents, result.topics[granularity], granularity
+        )
+        self.__visualize_clustering(
+            {"All Documents": "doc_map", "Cluster": "map"},
+            lambda type_: document_map(result, granularity)
+            if type_ == "doc_map"
+            else topic_map(result, granularity),
+        )
+
+    @staticmethod
+    def __load_upload():
+        with st.expander("📖 Library", expanded=True):
+            file = st.file_uploader(
+                "Upload a CSV or Excel file with one document per row",
+                type=["csv", "xlsx"],
+                help="The columns 'Name' and 'Content' are used if present, otherwise the first two columns.",
+            )
+            if file is None:
+                return None
+            try:
+                if file.name.endswith(".csv"):
+                    data = pd.read_csv(file)
+                else:
+                    data = pd.read_excel(file)
+            # pandas' EmptyDataError is a ValueError as well
+            except ValueError as e:
+                st.error(f"Cannot read {file.name}: {e}")
+                return None
+            if not {"Name", "Content"}.issubset(data.columns):
+                data = data.iloc[:, :2]
+                data.columns = ["Name", "Content"][: data.shape[1]]
+            if "Content" not in data.columns:
+                st.error("The file needs at least two columns: names and contents.")
+                return None
+            if data.shape[0] == 0:
+                st.error("The file contains no documents.")
+                return None
+            data = data[["Name", "Content"]].fillna("").astype(str)
+            paged_table(
+                "upload_library",
+                frame_loader(data.rename(columns={"Content": "Text"})),
+                len(data),
+                sort_columns=["Name"],
+            )
+        return data
+
     def page_description(self):
         st.write(
             "Smart Cluster is a tool that automatically clusters documents based on their similarity. You can use it "
@@ -41,12 +165,48 @@ class SmartCluster(AbstractPage):
         )
 
     def __sort_documents(self, data, granularity, col):
+        # the view selection of the visualization reruns the page, so the
+        # clustering has to stay visible after the button click
+        clustered = st.session_state.setdefault("clustered_use_cases", set())
         if col.button("✨ Cluster documents"):
+            clustered.add(self._use_case)
+        if self._use_case in clustered:
             with st.spinner("🦸🏼‍♀️ Finding clusters..."):
-                self.__show_sorted_documents(data, granularity)
-            self.__visualize_clustering(granularity)
+                with span(
+                    "smartcluster_load",
+                    domain=self._use_case,
+                    operation=f"{granularity}_excel",
+                ):
+                    topics = get_frame(
+                        os.path.join(
+                            _data_path,
+                            self._use_case,
+                            granularity,
+                            f"{granularity}_excel.xlsx",
+                        )
+                    )
+                self.__show_sorted_documents(data, topics, granularity)
+            views = {"All Documents": "doc_map", "Cluster": "map"}
+            if self._use_case in self._tot_use_cases:
+                # the topic model code is only needed for this check
+                from cluster.incremental import has_drifted
+
+                views["Topics over Time"] = "tot"
+                if has_drifted(
+                    os.path.join(_data_path, self._use_case),
+                    float(CONFIG["incremental"]["drift_threshold"]),
+                ):
+                    st.warning(
+                        "Many of the documents added since the last build fit none "
+                        "of these topics. The topics may be outdated.",
+                        icon="🧭",
+                    )
+            self.__visualize_clustering(
+                views, lambda type_: self.__load_figure(type_, granularity)
+            )
 
-    def __visualize_clustering(self, granularity):
+    @staticmethod
+    def __visualize_clustering(views, load_figure):
         with st.expander(
             "📈 Visualization",
             expanded=True,
@@ -56,32 +216,33 @@ class SmartCluster(AbstractPage):
                 "you can play around with the zoom, pan and filter options. Double-click on a topic to filter the "
                 "documents by that topic."
             )
-            if self._use_case in self._tot_use_cases:
-                self.__topic_over_time_visualization(granularity)
+            # only the selected view is decoded and sent to the browser
+            view = st.radio(
+                "View",
+                list(views.keys()),
+                horizontal=True,
+                label_visibility="collapsed",
+            )
+            figure = load_figure(views[view])
+            if figure is None:
+                st.info("There is no such visualization for this use case yet.")
             else:
-                tab1, tab2 = st.tabs(["All Documents", "Cluster"])
-
-                with tab1:
-                    doc_map = self.__load_figure("doc_map", granularity)
-                    st.plotly_chart(doc_map, use_container_width=True)
-
-                with tab2:
-                    cluster = self.__load_figure("map", granularity)
-                    st.plotly_chart(cluster, use_container_width=True)
+                st.plotly_chart(figure, use_container_width=True)
 
-    def __show_sorted_documents(self, data, granularity):
+    @staticmethod
+    def __show_sorted_documents(data, topics, granularity):
         st.success(f"Here are your document clusters!", icon="🦸🏼‍♀️")
-        topics = pd.read_excel(
-            os.path.join(
-                _data_path, self._use_case, granularity, f"{granularity}_excel.xlsx"
-            )
-        )
         st.write(topics[["Topic", "Name"]])
-        col_selection = f"{granularity}_topics"
-        sorted_library = data[[col_selection, "Name", "Content"]]
-        sorted_library.columns = ["Topic", "Name", "Text"]
+        sorted_library = column_view(
+            data, {"Topic": f"{granularity}_topics", "Name": "Name", "Text": "Content"}
+        )
         st.write("Here is your clustered library:")
-        st.write(sorted_library)
+        paged_table(
+            f"clustered_library_{granularity}",
+            frame_loader(sorted_library),
+            len(sorted_library),
+            sort_columns=["Topic", "Name"],
+        )
 
     @staticmethod
     def __determine_granularity():
@@ -103,35 +264,30 @@ class SmartCluster(AbstractPage):
                 f"**{temp_dict[self._use_case]}**. You can use Smart Cluster to get an overview over the documents and "
                 f"to find trends."
             )
-            data = pd.read_excel(os.path.join(_data_path, self._use_case, "data.xlsx"))
-            library = data[["Name", "Content"]]
-            library.columns = ["Name", "Text"]
-            st.write(library)
+            with span(
+                "smartcluster_load", domain=self._use_case, operation="data_excel"
+            ):
+                data = get_documents(os.path.join(_data_path, self._use_case))
+            library = column_view(data, {"Name": "Name", "Text": "Content"})
+            paged_table(
+                "cluster_library",
+                frame_loader(library),
+                len(library),
+                sort_columns=["Name"],
+            )
         return data
 
     def __load_figure(self, type_, granularity):
-        with open(
-            os.path.join(
-                _data_path, self._use_case, granularity, f"{granularity}_{type_}.json"
-            ),
-            "r",
-        ) as f:
-            data = json.loads(f.read())
-            return pio.from_json(data)
-
-    def __topic_over_time_visualization(self, granularity):
-        doc_map_tab, cluster_map_tab, tot_map = st.tabs(
-            ["All Documents", "Cluster", "Topics over Time"]
-        )
-
-        with doc_map_tab:
-            doc_map = self.__load_figure("doc_map", granularity)
-            st.plotly_chart(doc_map, use_container_width=True)
-
-        with cluster_map_tab:
-            cluster = self.__load_figure("map", granularity)
-            st.plotly_chart(cluster, use_container_width=True)
-
-        with tot_map:
-            tot = self.__load_figure("tot", granularity)
-            st.plotly_chart(tot, use_container_width=True)
+        with span(
+            "smartcluster_load",
+            domain=self._use_case,
+            operation=f"{granularity}_{type_}",
+        ):
+            return self._figures.get(
+                os.path.join(
+                    _data_path,
+                    self._use_case,
+                    granularity,
+                    f"{granularity}_{type_}.json",
+                )
+            )
@@ -0,0 +1,169 @@
+"""Cache warm-up at app start.
+
+Page modules registered for the warm-up define ``warm_up_tasks(connector)``
+returning ``(domain, operation, function)`` triples that load what a first
+visitor of the page sees with the default selections. ``start_warm_up`` imports
+the registered modules one after the other and runs their tasks once per
+process on a background thread, at most ``max_concurrency`` at a time, so a
+fresh deploy does not hit its first users with cold caches and does not flood
+semantha® either. Set the environment variable
+``PLAYGROUND_WARMUP_CONCURRENCY`` to ``0`` to switch it off.
+"""
+import functools
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence
+
+from metrics import span
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class _Task:
+    def __init__(self, domain: str, operation: str, function: Callable):
+        self.domain = domain
+        self.operation = operation
+        self.function = function
+        self.state = PENDING
+        self.seconds = None
+        self.error = None
+
+
+class WarmUp:
+    """Runs warm-up tasks in order on a background thread.
+
+    Each of ``tasks`` returns a group of ``(domain, operation, function)``
+    triples; they are called on the background thread as well, one after the
+    other while the tasks of the earlier groups run, so that collecting the
+    tasks (and importing what they need) does not delay the first page.
+    """
+
+    def __init__(
+        self, tasks: Sequence[Callable[[], Sequence[tuple]]], max_concurrency=2
+    ):
+        self.__collect = tasks
+        self.__tasks = []
+        self.__max_concurrency = max_concurrency
+        self.__started_at = None
+        self.__finished = threading.Event()
+        self.__lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """Whether every task has finished (successfully or not)."""
+        return self.__finished.is_set()
+
+    def start(self):
+        self.__started_at = time.monotonic()
+        threading.Thread(target=self.__run, name="warm-up", daemon=True).start()
+        return self
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.__finished.wait(timeout)
+
+    def status(self) -> list[dict]:
+        with self.__lock:
+            return [
+                {
+                    "domain": task.domain,
+                    "operation": task.operation,
+                    "state": task.state,
+                    "seconds": task.seconds,
+                    "error": task.error,
+                }
+                for task in self.__tasks
+            ]
+
+    def summary(self) -> dict:
+        states = [task["state"] for task in self.status()]
+        return {
+            "ready": self.ready,
+            "tasks": len(states),
+            **{state: states.count(state) for state in (DONE, FAILED, RUNNING)},
+            "elapsed": None
+            if self.__started_at is None
+            else round(time.monotonic() - self.__started_at, 1),
+        }
+
+    def __run(self):
+        with ThreadPoolExecutor(
+            max_workers=self.__max_concurrency, thread_name_prefix="warm-up"
+        ) as pool:
+            for collect in self.__collect:
+                try:
+                    tasks = [_Task(*task) for task in collect()]
+                except Exception as e:
+                    logging.warning(f"Cannot collect the warm-up tasks: {e}")
+                    continue
+                logging.info(f"Warming up {len(tasks)} caches")
+                with self.__lock:
+                    self.__tasks.extend(tasks)
+                pool.map(self.__run_task, tasks)
+        summary = self.summary()
+        logging.info(
+            f"Warm-up finished in {summary['elapsed']}s: "
+            f"{summary[DONE]} done, {summary[FAILED]} failed"
+        )
+        self.__finished.set()
+
+    def __run_task(self, task: _Task):
+        with self.__lock:
+            task.state = RUNNING
+        start = time.perf_counter()
+        try:
+            with span("warmup", domain=task.domain, operation=task.operation):
+                task.function()
+            state, error = DONE, None
+        except Exception as e:
+            logging.warning(f"Warm-up of {task.domain} {task.operation} failed: {e}")
+            state, error = FAILED, str(e)
+        with self.__lock:
+            task.state = state
+            task.error = error
+            task.seconds = round(time.perf_counter() - start, 3)
+
+
+_WARM_UP = None
+_WARM_UP_LOCK = threading.Lock()
+
+
+def start_warm_up(
+    modules: Sequence[str], server_url: str, api_key: str, max_concurrency: int = None
+) -> WarmUp:
+    """Warm up the caches for the given page modules once per process.
+
+    Every module in ``modules`` must define ``warm_up_tasks``. The modules are
+    only imported on the warm-up thread, when their tasks are collected.
+    """
+    global _WARM_UP
+    if max_concurrency is None:
+        max_concurrency = int(os.environ.get("PLAYGROUND_WARMUP_CONCURRENCY", 2))
+    with _WARM_UP_LOCK:
+        if _WARM_UP is not None or max_concurrency <= 0:
+            return _WARM_UP
+
+        def connector():
+            # logs in on first use, from a warm-up thread
+            from semantha.SemanthaConnector import get_connector
+
+            return get_connector(server_url, api_key)
+
+        def page_tasks(name):
+            return importlib.import_module(name).warm_up_tasks(connector)
+
+        _WARM_UP = WarmUp(
+            [functools.partial(page_tasks, name) for name in modules], max_concurrency
+        ).start()
+        return _WARM_UP
+
+
+def warm_up() -> WarmUp:
+    """The warm-up of this process, ``None`` if it was not started."""
+    return _WARM_UP
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+
+from benchmarks.mock_server import MockSemanthaServer
+from semantha.SemanthaConnector import SemanthaConnector
+from semantha.async_connector import AsyncSemanthaConnector, query_libraries
+
+
+class _InFlight:
+    """Delegates to the connector and records the most calls per domain at once."""
+
+    def __init__(self, connector):
+        self.__connector = connector
+        self.__lock = threading.Lock()
+        self.__in_flight = Counter()
+        self.peak = Counter()
+
+    def query_library(self, text, domain, *args):
+        with self.__lock:
+            self.__in_flight[domain] += 1
+            self.peak[domain] = max(self.peak[domain], self.__in_flight[domain])
+        try:
+            return self.__connector.query_library(text, domain, *args)
+        finally:
+            with self.__lock:
+                self.__in_flight[domain] -= 1
+
+
+@pytest.fixture(scope="module")
+def connector():
+    with MockSemanthaServer(library_size=50, latency=0.02) as server:
+        yield SemanthaConnector(server.url, "test")
+
+
+def test_calls_in_flight_are_limited_per_domain(connector):
+    spy = _InFlight(connector)
+    async_connector = AsyncSemanthaConnector(spy, max_concurrency=2)
+    queries = [
+        dict(text=f"w{i} w{i + 1}", domain=domain, threshold=0.0)
+        for i in range(6)
+        for domain in ("a", "b")
+    ]
+    results = query_libraries(async_connector, queries)
+    assert len(results) == len(queries)
+    assert all(results)
+    assert spy.peak == {"a": 2, "b": 2}
+
+
+def test_documents_are_gathered_in_order(connector):
+    async_connector = AsyncSemanthaConnector(connector)
+    library = asyncio.run(async_connector.get_library("a", limit=5))
+    documents = asyncio.run(
+        async_connector.get_documents([f"doc-{i:06d}" for i in range(5)], "a")
+    )
+    assert [d["doc_name"] for d in documents] == [r["doc_name"] for r in library]
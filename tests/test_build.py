@@ -0,0 +1,63 @@
+import os
+
+import pandas as pd
+import pytest
+
+from cluster import build
+from cluster.data_store import DOCUMENT_TOPICS, get_documents
+
+_SETTINGS = dict(broad_topics=2, fine_topics=3, outlier_threshold=0.1)
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(build, "DATA_PATH", str(tmp_path))
+    return tmp_path
+
+
+def test_build_leaves_data_xlsx_untouched(data_path):
+    source = data_path / "library" / "data.xlsx"
+    source.parent.mkdir()
+    pd.DataFrame(
+        {
+            "Name": [f"doc {i}" for i in range(6)],
+            "Content": [
+                "apples and pears",
+                "pears",
+                "cars",
+                "trucks",
+                "bikes",
+                "plums",
+            ],
+        }
+    ).to_excel(source, index=False)
+    before = source.read_bytes()
+
+    assert build.build_use_case("library", _SETTINGS) == "built"
+    assert source.read_bytes() == before
+    assert os.path.exists(data_path / "library" / DOCUMENT_TOPICS)
+    documents = get_documents(str(data_path / "library"))
+    assert list(documents.columns) == ["Name", "Content", "broad_topics", "fine_topics"]
+    assert build.build_use_case("library", _SETTINGS) == "up to date"
+
+
+def test_use_cases_without_data_are_not_built(data_path):
+    (data_path / "library").mkdir()
+    assert build.build_use_case("library", _SETTINGS).startswith("skipped")
+
+
+def test_curated_artifacts_are_only_replaced_with_force(data_path):
+    use_case = data_path / "library"
+    (use_case / "broad").mkdir(parents=True)
+    pd.DataFrame({"Name": ["a", "b"], "Content": ["apples", "cars"]}).to_excel(
+        use_case / "data.xlsx", index=False
+    )
+    curated = use_case / "broad" / "broad_map.json"
+    curated.write_text("{}")
+
+    assert build.build_use_case("library", _SETTINGS).startswith("skipped")
+    assert curated.read_text() == "{}"
+    assert build.build_use_case("library", _SETTINGS, force=True) == "built"
+    assert curated.read_text() != "{}"
+    # from now on the use case is the build's own
+    assert build.build_use_case("library", _SETTINGS) == "up to date"
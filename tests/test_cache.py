@@ -0,0 +1,47 @@
+from semantha import cache
+from semantha.cache import LRUCache
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    lru = LRUCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.stats()["evictions"] == 1
+
+
+def test_size_bound():
+    lru = LRUCache(max_size=10, size_of=len)
+    lru.put("a", "x" * 6)
+    lru.put("b", "x" * 6)
+    assert lru.get("a") is None
+    assert lru.stats()["size"] == 6
+    # values larger than the whole cache are not stored at all
+    lru.put("c", "x" * 11)
+    assert lru.get("c") is None and lru.get("b") == "x" * 6
+
+
+def test_replacing_an_entry_updates_its_size():
+    lru = LRUCache(max_size=10, size_of=len)
+    lru.put("a", "x" * 8)
+    lru.put("a", "x" * 2)
+    lru.put("b", "x" * 8)
+    assert lru.get("a") == "xx"
+    assert lru.stats()["size"] == 10
+
+
+def test_expired_entries_are_misses_but_can_be_served_stale(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(ttl=10)
+    lru.put("a", 1)
+    assert lru.get("a") == 1
+    now[0] += 11
+    assert lru.get("a", "default") == "default"
+    assert lru.get_stale("a") == 1
+    assert lru.stats()["hits"] == 1
+    assert lru.stats()["misses"] == 1
+    assert lru.stats()["expirations"] == 1
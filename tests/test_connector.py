@@ -0,0 +1,18 @@
+from benchmarks import mock_server
+from benchmarks.mock_server import MockSemanthaServer
+from semantha.SemanthaConnector import SemanthaConnector
+
+
+def test_library_size_is_counted_when_the_server_reports_no_total(monkeypatch, caplog):
+    list_documents = mock_server._Handler._GET_referencedocuments
+
+    def without_total(*args):
+        reply = list_documents(*args)
+        del reply["meta"]["page"]["total"]
+        return reply
+
+    monkeypatch.setattr(mock_server._Handler, "_GET_referencedocuments", without_total)
+    with MockSemanthaServer(library_size=2500, latency=0) as server:
+        connector = SemanthaConnector(server.url, "test")
+        assert connector.library_size("a") == 2500
+    assert "counting pages" in caplog.text
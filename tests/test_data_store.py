@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+
+from cluster.data_store import FrameStore, as_text, column_view
+
+
+def _workbook(path, names):
+    pd.DataFrame(
+        {
+            "Name": names,
+            "Content": [f"text of {name}" for name in names],
+            "fine_topics": ["0_a", "1_b"] * (len(names) // 2),
+        }
+    ).to_excel(path, index=False)
+
+
+def test_outdated_caches_are_removed_but_running_conversions_are_kept(tmp_path):
+    workbook = tmp_path / "data.xlsx"
+    cache_dir = tmp_path / "cache"
+    store = FrameStore(cache_dir=str(cache_dir))
+    _workbook(workbook, ["a", "b"])
+    store.get(str(workbook))
+    (first,) = os.listdir(cache_dir)
+    running = cache_dir / f"{first}.999.1.tmp"
+    running.write_bytes(b"")
+
+    _workbook(workbook, ["a", "b", "c", "d"])
+    frame = store.get(str(workbook))
+    assert len(frame) == 4
+    assert first not in os.listdir(cache_dir)
+    assert running.exists()
+    assert store.stats()["conversions"] == 2
+
+
+def test_frames_are_shared_compact_and_viewed_without_copies(tmp_path):
+    workbook = tmp_path / "data.xlsx"
+    _workbook(workbook, [f"n{i}" for i in range(10)])
+    store = FrameStore(cache_dir=str(tmp_path / "cache"))
+    frame = store.get(str(workbook))
+    assert store.get(str(workbook)) is frame
+    assert isinstance(frame["Content"].dtype, pd.StringDtype)
+    assert isinstance(frame["fine_topics"].dtype, pd.CategoricalDtype)
+
+    view = column_view(frame, {"Topic": "fine_topics", "Text": "Content"})
+    assert list(view.columns) == ["Topic", "Text"]
+    assert view["Text"].array is frame["Content"].array
+    assert as_text(view["Text"]).tolist() == frame["Content"].tolist()
@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from semantha.domain_models import DomainModels
+
+
+class FakeSettings:
+    """The similarity model of every domain, like the settings on the server."""
+
+    def __init__(self, delay=0.0):
+        self.models = {}
+        self.writes = 0
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def read(self, domain):
+        time.sleep(self.delay)
+        return self.models.get(domain)
+
+    def write(self, domain, model_id):
+        time.sleep(self.delay)
+        with self.lock:
+            self.writes += 1
+            self.models[domain] = model_id
+        return model_id
+
+
+def test_pinned_domains_are_written_once():
+    settings = FakeSettings(delay=0.01)
+    models = DomainModels(settings.read, settings.write)
+
+    def compare(model_id):
+        with models.use(f"PG_Compare_{model_id}", model_id):
+            time.sleep(0.001)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(compare, [19, 9021] * 50))
+    assert settings.writes == 2
+    assert models.active() == {"PG_Compare_19": 19, "PG_Compare_9021": 9021}
+
+
+def test_a_shared_domain_never_runs_two_models_at_once():
+    settings = FakeSettings()
+    models = DomainModels(settings.read, settings.write)
+    running = {}
+    errors = []
+
+    def compare(model_id):
+        with models.use("PG_Compare", model_id):
+            if settings.models["PG_Compare"] != model_id:
+                errors.append(model_id)
+            running[model_id] = running.get(model_id, 0) + 1
+            if len([m for m, n in running.items() if n]) > 1:
+                errors.append("overlap")
+            time.sleep(0.001)
+            running[model_id] -= 1
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(compare, [19, 9021, 9001] * 30))
+    assert errors == []
+
+
+def test_a_single_compare_is_not_starved_by_a_batch():
+    settings = FakeSettings()
+    models = DomainModels(settings.read, settings.write)
+    stop = threading.Event()
+
+    def batch():
+        while not stop.is_set():
+            with models.use("PG_Compare", 9021):
+                time.sleep(0.01)
+
+    threads = [threading.Thread(target=batch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    waited = []
+
+    def single():
+        start = time.monotonic()
+        with models.use("PG_Compare", 19):
+            waited.append(time.monotonic() - start)
+
+    compare = threading.Thread(target=single)
+    compare.start()
+    compare.join(5)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    compare.join()
+    # only the batch requests that were already running are waited for
+    assert waited and waited[0] < 0.5
+
+
+def test_no_lock_is_held_while_the_settings_are_written():
+    release = threading.Event()
+    settings = FakeSettings()
+
+    def slow_write(domain, model_id):
+        if domain == "slow":
+            release.wait(5)
+        return settings.write(domain, model_id)
+
+    models = DomainModels(settings.read, slow_write)
+    writer = threading.Thread(target=lambda: models.use("slow", 1).__enter__())
+    writer.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    with models.use("fast", 2):
+        assert models.active().get("slow") is None
+    assert time.monotonic() - start < 1
+    release.set()
+    writer.join()
+
+
+def test_a_failed_switch_does_not_block_the_domain():
+    settings = FakeSettings()
+    failures = [RuntimeError("settings unavailable")]
+
+    def flaky_write(domain, model_id):
+        if failures:
+            raise failures.pop()
+        return settings.write(domain, model_id)
+
+    models = DomainModels(settings.read, flaky_write)
+    with pytest.raises(RuntimeError):
+        with models.use("PG_Compare", 19):
+            pass
+    with models.use("PG_Compare", 19):
+        assert settings.models["PG_Compare"] == 19
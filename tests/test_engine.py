@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from cluster.engine import OUTLIER_TOPIC, ClusteringEngine
+
+
+def test_small_libraries_get_at_most_one_topic_per_document():
+    result = ClusteringEngine(broad_topics=10, fine_topics=40).cluster(
+        ["a", "b"], ["apples and pears", "cars and trucks"]
+    )
+    assert len(result.documents) == 2
+    assert len(result.topics["fine"]) <= 2
+    assert OUTLIER_TOPIC not in result.topics["broad"]["Topic"].tolist()
+
+
+def test_empty_libraries_are_rejected():
+    with pytest.raises(ValueError, match="no documents"):
+        ClusteringEngine().cluster([], [])
+
+
+@pytest.mark.parametrize("topics", [{"fine_topics": 0}, {"broad_topics": 0}])
+def test_at_least_one_topic_is_needed(topics):
+    with pytest.raises(ValueError, match="At least one topic"):
+        ClusteringEngine(**topics)
+
+
+def test_separated_groups_get_their_own_topic_and_outliers_get_minus_one():
+    rng = np.random.default_rng(0)
+    directions = np.eye(3, dtype=np.float32)
+    embeddings = np.vstack(
+        [directions[0] + 0.05 * rng.standard_normal((10, 3))]
+        + [directions[1] + 0.05 * rng.standard_normal((10, 3))]
+        + [directions[2][None, :]]
+    )
+    names = [f"doc {i}" for i in range(len(embeddings))]
+    result = ClusteringEngine(
+        broad_topics=2, fine_topics=2, outlier_threshold=0.5
+    ).cluster(names, ["text"] * len(names), embeddings=embeddings)
+    for granularity in ("broad", "fine"):
+        topics = result.documents[f"{granularity}_topics"]
+        assert topics[:10].nunique() == 1 and topics[10:20].nunique() == 1
+        assert topics[0] != topics[10]
+        assert topics[20].startswith(f"{OUTLIER_TOPIC}_")
+
+
+def test_documents_on_the_same_subject_are_clustered_together():
+    fruit = [
+        f"{a} and {b} are sweet fruit"
+        for a, b in [("apples", "pears"), ("pears", "plums"), ("plums", "apples")]
+    ]
+    vehicles = [
+        f"{a} and {b} need fuel on the road"
+        for a, b in [("cars", "trucks"), ("trucks", "buses"), ("buses", "cars")]
+    ]
+    result = ClusteringEngine(broad_topics=2, fine_topics=2).cluster(
+        [f"doc {i}" for i in range(6)], fruit + vehicles
+    )
+    topics = result.documents["fine_topics"]
+    assert topics[:3].nunique() == 1 and topics[3:].nunique() == 1
+    assert topics[0] != topics[3]
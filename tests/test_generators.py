@@ -0,0 +1,44 @@
+import pytest
+
+from rag.generators import (
+    ChatCompletionsGenerator,
+    ExtractiveGenerator,
+    get_generator,
+)
+from rag.retrieval import Context, Passage
+
+# the [generator] section of the config, with the url and model of the secrets
+_SETTINGS = dict(
+    max_sentences=2, url="http://127.0.0.1:1/v1", model="model", api_key="key"
+)
+
+
+def test_every_backend_gets_only_its_settings():
+    extractive = get_generator("extractive", **_SETTINGS)
+    assert isinstance(extractive, ExtractiveGenerator)
+    assert isinstance(
+        get_generator("chat_completions", **_SETTINGS), ChatCompletionsGenerator
+    )
+    assert get_generator("extractive", max_sentences=2) is extractive
+
+
+def test_missing_and_unknown_backends_are_reported():
+    with pytest.raises(ValueError, match="needs the settings url, model"):
+        get_generator("chat_completions", max_sentences=2)
+    with pytest.raises(ValueError, match="Unknown generator backend"):
+        get_generator("oracle")
+
+
+def test_extractive_answers_cite_their_passages():
+    context = Context(
+        [
+            Passage("1", "a", "The sky is blue. Grass is green.", 0.9),
+            Passage("2", "b", "The president is elected by the assembly.", 0.8),
+        ]
+    )
+    answer = "".join(
+        ExtractiveGenerator(max_sentences=1).stream(
+            "Who elects the president?", context
+        )
+    )
+    assert answer == "The president is elected by the assembly. [2] "
@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster import build, incremental
+from cluster.incremental import MODEL, TopicModel, has_drifted, load_model, topic_id
+
+
+def _save_model(path, documents, outliers):
+    arrays = {g: np.zeros((1, 2), dtype=np.float32) for g in incremental.GRANULARITIES}
+    ids = {g: np.array([0]) for g in incremental.GRANULARITIES}
+    names = {g: np.array(["0_topic"]) for g in incremental.GRANULARITIES}
+    TopicModel(ids, names, arrays, arrays, documents, outliers).save(str(path))
+
+
+def test_drift_is_read_once_per_model_version(tmp_path, monkeypatch):
+    path = tmp_path / MODEL
+    _save_model(path, documents=10, outliers=5)
+    loads = []
+    load = np.load
+    monkeypatch.setattr(
+        incremental.np, "load", lambda *args: loads.append(args) or load(*args)
+    )
+    assert has_drifted(str(tmp_path), 0.3)
+    assert has_drifted(str(tmp_path), 0.3)
+    assert len(loads) == 1
+
+    _save_model(path, documents=20, outliers=5)
+    os.utime(path, ns=(0, 0))
+    assert not has_drifted(str(tmp_path), 0.3)
+    assert len(loads) == 2
+
+
+def test_use_cases_without_a_model_have_not_drifted(tmp_path):
+    assert not has_drifted(str(tmp_path), 0.3)
+
+
+def test_a_model_needs_documents_to_be_derived_from(tmp_path):
+    with pytest.raises(FileNotFoundError, match="neither"):
+        load_model(str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "name, expected", [("3_ai_and_of", 3), ("12", 12), ("-1_other", -1), ("x", -1)]
+)
+def test_topic_id(name, expected):
+    assert topic_id(name) == expected
+
+
+def test_documents_are_assigned_to_the_nearest_topic():
+    centroids = {g: np.eye(2, 3, dtype=np.float32) for g in incremental.GRANULARITIES}
+    centers = {g: np.array([[0.0, 0.0], [10.0, 0.0]]) for g in centroids}
+    ids = {g: np.array([0, 1]) for g in centroids}
+    names = {g: np.array(["0_a", "1_b"]) for g in centroids}
+    model = TopicModel(ids, names, centroids, centers)
+    x = np.array([[0, 1, 0], [0.6, 0, 0.8]], dtype=np.float32)
+
+    topics, similarity, positions = model.assign(x, "fine")
+    assert topics.tolist() == [1, 0]
+    assert similarity == pytest.approx([1.0, 0.6])
+    assert positions[0] == pytest.approx([10.0, 0.0], abs=1e-3)
+
+
+@pytest.fixture
+def use_case(tmp_path, monkeypatch):
+    """A use case built from fruit and vehicle documents without outliers."""
+    monkeypatch.setattr(build, "DATA_PATH", str(tmp_path))
+    (tmp_path / "feed").mkdir()
+    fruit = ["apples pears plums", "pears plums cherries", "plums apples cherries"]
+    vehicles = ["cars trucks buses", "trucks buses bikes", "buses cars bikes"]
+    pd.DataFrame(
+        {
+            "Name": [f"doc {i}" for i in range(6)],
+            "Content": fruit + vehicles,
+            "year": [2020] * 6,
+        }
+    ).to_excel(tmp_path / "feed" / "data.xlsx", index=False)
+    settings = dict(broad_topics=2, fine_topics=2, outlier_threshold=0.0)
+    assert build.build_use_case("feed", settings, time_column="year") == "built"
+    return tmp_path / "feed"
+
+
+def _figure(use_case, granularity, type_):
+    return incremental._read_figure(str(use_case), granularity, type_)
+
+
+def test_new_documents_grow_their_topics_and_outliers_get_a_trace(use_case):
+    topics = pd.read_excel(use_case / "broad" / "broad_excel.xlsx", index_col=0)
+    (fruit_topic,) = [
+        t for t, n in zip(topics["Topic"], topics["Name"]) if "plums" in n
+    ]
+    counts = dict(zip(topics["Topic"], topics["Count"]))
+    doc_map = _figure(use_case, "broad", "doc_map")
+    assert "other" not in [trace["name"] for trace in doc_map["data"]]
+    points = {topic_id(t["name"]): len(t["x"]) for t in doc_map["data"]}
+
+    report = incremental.add_documents(
+        str(use_case),
+        pd.DataFrame(
+            {
+                "Name": ["near", "far"],
+                "Content": ["cherries and plums", "quantum chromodynamics"],
+                "year": [2021, 2021],
+            }
+        ),
+        "year",
+        outlier_threshold=0.3,
+        drift_threshold=0.9,
+    )
+
+    assert report.outliers == 1 and not report.drift
+    assert report.topics["broad"] == {-1: 1, fruit_topic: 1}
+    topics = pd.read_excel(use_case / "broad" / "broad_excel.xlsx", index_col=0)
+    assert dict(zip(topics["Topic"], topics["Count"])) == {
+        t: c + (t == fruit_topic) for t, c in counts.items()
+    }
+    traces = {t["name"]: t for t in _figure(use_case, "broad", "doc_map")["data"]}
+    assert traces["other"]["hovertext"] == ["quantum chromodynamics"]
+    assert {topic_id(n): len(t["x"]) for n, t in traces.items()} == {
+        **{t: n + (t == fruit_topic) for t, n in points.items()},
+        -1: 1,
+    }
+    (topic_map,) = _figure(use_case, "broad", "map")["data"]
+    sizes = {row[0]: row[2] for row in topic_map["customdata"]}
+    assert sizes == {t: c + (t == fruit_topic) for t, c in counts.items()}
+    assert topic_map["marker"]["size"] == list(sizes.values())
+    tot = {topic_id(t["name"]): t for t in _figure(use_case, "broad", "tot")["data"]}
+    assert dict(zip(tot[fruit_topic]["x"], tot[fruit_topic]["y"])) == {
+        2020: 3,
+        2021: 1,
+    }
+    assert load_model(str(use_case)).documents == 2
+    assert len(pd.read_csv(use_case / incremental.INCREMENTS)) == 2
@@ -0,0 +1,103 @@
+import random
+
+import pytest
+
+from semantha import resilience
+from semantha.resilience import (
+    AdaptiveLimiter,
+    BackendUnavailableError,
+    CircuitBreaker,
+    backoff_delays,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record(failed=True)
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    _fail(breaker, 2)
+    breaker.before_call()
+    breaker.record(failed=False)
+    _fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    _fail(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(BackendUnavailableError):
+        breaker.before_call()
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_circuit_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _fail(breaker, 1)
+    clock[0] += 31
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(BackendUnavailableError):
+        breaker.before_call()
+    breaker.record(failed=False)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    _fail(breaker, 1)
+    clock[0] += 31
+    _fail(breaker, 1)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 29
+    with pytest.raises(BackendUnavailableError):
+        breaker.before_call()
+    # a failed probe is no new trip
+    assert breaker.stats()["trips"] == 1
+
+
+def _call(limiter, latency, failed=False):
+    limiter.acquire()
+    limiter.release(latency, failed)
+
+
+def test_limit_shrinks_on_failures_and_rising_latency():
+    limiter = AdaptiveLimiter(initial=16, smoothing=0.5)
+    _call(limiter, 0.1, failed=True)
+    assert limiter.limit == 12
+    for _ in range(5):
+        _call(limiter, 1.0)
+    assert limiter.limit < 12
+
+
+def test_smoothing_sets_the_weight_of_the_latest_latency():
+    stats = {}
+    for smoothing in (0.2, 0.8):
+        limiter = AdaptiveLimiter(smoothing=smoothing)
+        _call(limiter, 0.1)
+        _call(limiter, 1.1)
+        stats[smoothing] = limiter.stats()["short_latency_ms"]
+    assert stats == {0.2: 300.0, 0.8: 900.0}
+
+
+def test_full_limit_rejects_after_the_queue_timeout():
+    limiter = AdaptiveLimiter(initial=1, queue_timeout=0.01)
+    limiter.acquire()
+    with pytest.raises(BackendUnavailableError):
+        limiter.acquire()
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_backoff_delays_are_capped():
+    delays = list(backoff_delays(6, base=0.1, cap=1.0, rng=random.Random(0)))
+    assert len(delays) == 6
+    assert all(0 <= d <= min(1.0, 0.1 * 2**n) for n, d in enumerate(delays))
@@ -0,0 +1,67 @@
+from rag.retrieval import Context, Conversation, Retriever, pack
+
+_DOCUMENTS = {
+    "president": "The Federal President is elected by the Federal Convention.\n"
+    "The Federal President represents the Federation in international law.",
+    "chancellor": "The Federal Chancellor determines the guidelines of policy.",
+}
+
+
+class FakeConnector:
+    def __init__(self):
+        self.queries = []
+
+    def query_library(self, text, domain, threshold, max_references, tags):
+        self.queries.append(text)
+        return {
+            doc_id: {"doc_name": doc_id, "content": content, "similarity": 0.9}
+            for doc_id, content in _DOCUMENTS.items()
+        }
+
+
+def _retriever(connector):
+    return Retriever(connector, "PG_RAG_Legal", passage_tokens=12, token_budget=12)
+
+
+def test_follow_ups_reuse_the_passages_of_their_conversation_only():
+    connector = FakeConnector()
+    retriever = _retriever(connector)
+    conversation = Conversation()
+    retriever.context("Who elects the Federal President?", conversation=conversation)
+    retriever.context("Who elects the Federal President ?", conversation=conversation)
+    assert len(connector.queries) == 1
+
+    # the same follow-up in another session or without a conversation
+    retriever.context("Who elects the Federal President ?", conversation=Conversation())
+    retriever.context("Who elects the Federal President now?")
+    assert len(connector.queries) == 3
+
+
+def test_reused_passages_are_ranked_for_the_follow_up():
+    connector = FakeConnector()
+    retriever = Retriever(
+        connector,
+        "PG_RAG_Legal",
+        passage_tokens=12,
+        token_budget=12,
+        topic_similarity=0.5,
+    )
+    conversation = Conversation()
+    first = retriever.context(
+        "Who elects the Federal President?", conversation=conversation
+    )
+    follow_up = retriever.context(
+        "Does the Federal President represent the Federation?",
+        conversation=conversation,
+    )
+    assert len(connector.queries) == 1
+    assert "elected" in first.passages[0].text
+    assert "represents the Federation" in follow_up.passages[0].text
+
+
+def test_pack_keeps_the_order_of_equally_relevant_passages():
+    connector = FakeConnector()
+    passages = _retriever(connector).context("Federal").passages
+    assert pack(passages, 100).passages == passages
+    assert pack(passages, 100, [0.0] * len(passages)).passages == passages
+    assert isinstance(pack([], 100), Context)
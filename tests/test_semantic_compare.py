@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from subpage.semantic_compare import pairs_from_table
+
+
+def test_pairs_use_the_checkbox_without_a_flag_column():
+    table = pd.DataFrame({"a": ["x", "y"], "b": ["z", None]})
+    assert pairs_from_table(table, True) == [("x", "z", True), ("y", "", True)]
+
+
+def test_flag_column_is_parsed_and_overrides_the_checkbox():
+    table = pd.DataFrame(
+        {
+            "a": ["1", "2", "3", "4", "5"],
+            "b": ["1", "2", "3", "4", "5"],
+            "omd": ["no", "False", "0", "yes", None],
+        }
+    )
+    flags = [omd for _, _, omd in pairs_from_table(table, True)]
+    assert flags == [False, False, False, True, True]
+
+
+def test_boolean_and_numeric_flags():
+    table = pd.DataFrame({"a": ["x"] * 3, "b": ["y"] * 3, "omd": [1.0, 0.0, None]})
+    assert [omd for *_, omd in pairs_from_table(table, False)] == [True, False, False]
+    table["omd"] = [True, False, True]
+    assert [omd for *_, omd in pairs_from_table(table, False)] == [True, False, True]
+
+
+def test_invalid_flags_are_reported_by_row():
+    table = pd.DataFrame({"a": ["x", "y"], "b": ["x", "y"], "omd": ["yes", "maybe"]})
+    with pytest.raises(ValueError, match="row\\(s\\) 2"):
+        pairs_from_table(table, False)
+
+
+@pytest.mark.parametrize(
+    "table",
+    [pd.DataFrame({"a": ["only one column"]}), pd.DataFrame({"a": [], "b": []})],
+)
+def test_tables_without_pairs_are_rejected(table):
+    with pytest.raises(ValueError):
+        pairs_from_table(table, False)
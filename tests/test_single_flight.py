@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from semantha.single_flight import SingleFlight
+
+
+def _concurrent(flight, key, function, callers=4):
+    """``callers`` calls of ``key`` that are all in flight at once."""
+    release = threading.Event()
+
+    def leader():
+        release.wait(5)
+        return function()
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(flight.do, key, leader)]
+        while flight.stats()["in_flight"] == 0:
+            time.sleep(0.001)
+        futures += [pool.submit(flight.do, key, function) for _ in range(callers - 1)]
+        while flight.stats()["coalesced"] < callers - 1:
+            time.sleep(0.001)
+        release.set()
+        return futures
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight()
+    calls = []
+    futures = _concurrent(flight, "key", lambda: calls.append(1) or "result")
+    assert [future.result() for future in futures] == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 3}
+
+
+def test_waiting_callers_get_the_exception():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("backend down")
+
+    for future in _concurrent(flight, "key", fail):
+        with pytest.raises(RuntimeError, match="backend down"):
+            future.result()
+    # the failed call is not remembered
+    assert flight.do("key", lambda: "retried") == "retried"
+
+
+def test_different_keys_and_later_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == 1
+    assert flight.do("a", lambda: 2) == 2
+    assert flight.do("b", lambda: 3) == 3
+    assert flight.stats()["executed"] == 3
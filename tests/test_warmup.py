@@ -0,0 +1,29 @@
+from warmup import DONE, FAILED, WarmUp
+
+
+def test_task_groups_are_collected_in_turn_and_failures_are_kept():
+    collected = []
+
+    def group(name, function):
+        def collect():
+            collected.append(name)
+            return [(name, "load", function)]
+
+        return collect
+
+    def broken():
+        raise RuntimeError("cannot import")
+
+    def fail():
+        raise ValueError("backend down")
+
+    warm_up = WarmUp(
+        [group("a", lambda: None), broken, group("b", fail)], max_concurrency=1
+    ).start()
+    assert warm_up.wait(5)
+    assert collected == ["a", "b"]
+    assert [(t["domain"], t["state"]) for t in warm_up.status()] == [
+        ("a", DONE),
+        ("b", FAILED),
+    ]
+    assert warm_up.summary()["tasks"] == 2